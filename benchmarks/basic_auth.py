@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the GET /api/v1/identity throughput of a basic auth client with
+and without the verified credentials cache.
+
+The database must be initialized with bin/dci-dbinit, the credentials are
+read from DCI_LOGIN and DCI_PASSWORD (admin/admin by default).
+"""
+
+import base64
+import os
+import sys
+import time
+
+from dci import app
+from dci import auth_mechanism
+
+DCI_LOGIN = os.environ.get("DCI_LOGIN", "admin")
+DCI_PASSWORD = os.environ.get("DCI_PASSWORD", "admin")
+
+
+def run(client, headers, nb_requests):
+    start = time.time()
+    for _ in range(nb_requests):
+        r = client.get("/api/v1/identity", headers=headers)
+        assert r.status_code == 200, r.data
+    return nb_requests / (time.time() - start)
+
+
+def main(nb_requests=200):
+    dci_app = app.create_app()
+    client = dci_app.test_client()
+    credentials = base64.b64encode(("%s:%s" % (DCI_LOGIN, DCI_PASSWORD)).encode())
+    headers = {"Authorization": "Basic %s" % credentials.decode()}
+
+    ttl = auth_mechanism.basic_auth_cache.ttl
+    auth_mechanism.basic_auth_cache.ttl = 0
+    without_cache = run(client, headers, nb_requests)
+    auth_mechanism.basic_auth_cache.ttl = ttl or 60
+    with_cache = run(client, headers, nb_requests)
+
+    print("requests: %s" % nb_requests)
+    print("without cache: %.1f req/s" % without_cache)
+    print("with cache:    %.1f req/s" % with_cache)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the GET /api/v1/jobs/<id> latency of the "orm" and "postgresql"
+JOB_DETAIL_BUILDER on a job with many jobstates, files, components and
+results.
+
+The database must be initialized with bin/dci-dbinit, the credentials are
+read from DCI_LOGIN and DCI_PASSWORD (admin/admin by default). The job and
+its resources are created in a dedicated product and team, removed at the
+end.
+"""
+
+import base64
+import datetime
+import os
+import sys
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from dci import app
+from dci.common import utils
+from dci.db import models2
+
+DCI_LOGIN = os.environ.get("DCI_LOGIN", "admin")
+DCI_PASSWORD = os.environ.get("DCI_PASSWORD", "admin")
+
+
+def create_job(session, nb_rows):
+    suffix = utils.gen_uuid()
+    product = models2.Product(name="bench", label="bench-%s" % suffix)
+    team = models2.Team(name="bench-%s" % suffix)
+    session.add_all([product, team])
+    session.flush()
+    topic = models2.Topic(
+        name="bench", product_id=product.id, component_types=["type0"]
+    )
+    remoteci = models2.Remoteci(name="bench", team_id=team.id)
+    session.add_all([topic, remoteci])
+    session.flush()
+    components = [
+        models2.Component(
+            name="component-%s" % i,
+            display_name="component-%s" % i,
+            type="type%s" % i,
+            topic_id=topic.id,
+        )
+        for i in range(10)
+    ]
+    job = models2.Job(
+        name="bench",
+        topic_id=topic.id,
+        product_id=product.id,
+        remoteci_id=remoteci.id,
+        team_id=team.id,
+        components=components,
+    )
+    session.add(job)
+    session.flush()
+    created_at = datetime.datetime.utcnow()
+    for i in range(nb_rows):
+        jobstate = models2.Jobstate(
+            job_id=job.id,
+            status="running",
+            comment="step %s" % i,
+            created_at=created_at + datetime.timedelta(seconds=i),
+        )
+        session.add(jobstate)
+        session.flush()
+        for name in ("stdout", "stderr"):
+            session.add(
+                models2.File(
+                    name="%s-%s" % (name, i),
+                    job_id=job.id,
+                    jobstate_id=jobstate.id,
+                    team_id=team.id,
+                    size=1024,
+                )
+            )
+        junit = models2.File(
+            name="junit-%s.xml" % i, job_id=job.id, team_id=team.id, size=2048
+        )
+        session.add(junit)
+        session.flush()
+        if i % 10 == 0:
+            session.add(
+                models2.TestsResult(
+                    name=junit.name,
+                    total=10,
+                    success=10,
+                    skips=0,
+                    failures=0,
+                    errors=0,
+                    time=1,
+                    job_id=job.id,
+                    file_id=junit.id,
+                )
+            )
+    session.commit()
+    return product.id, team.id, job.id
+
+
+def run(client, headers, job_id, nb_requests):
+    start = time.time()
+    for _ in range(nb_requests):
+        r = client.get("/api/v1/jobs/%s" % job_id, headers=headers)
+        assert r.status_code == 200, r.data
+    return (time.time() - start) * 1000 / nb_requests
+
+
+def main(nb_rows=300, nb_requests=50):
+    dci_app = app.create_app()
+    client = dci_app.test_client()
+    credentials = base64.b64encode(("%s:%s" % (DCI_LOGIN, DCI_PASSWORD)).encode())
+    headers = {"Authorization": "Basic %s" % credentials.decode()}
+
+    session = sessionmaker(bind=dci_app.engine)()
+    product_id, team_id, job_id = create_job(session, nb_rows)
+    try:
+        dci_app.config["JOB_DETAIL_BUILDER"] = "orm"
+        run(client, headers, job_id, 1)
+        orm = run(client, headers, job_id, nb_requests)
+        dci_app.config["JOB_DETAIL_BUILDER"] = "postgresql"
+        run(client, headers, job_id, 1)
+        postgresql = run(client, headers, job_id, nb_requests)
+    finally:
+        session.rollback()
+        session.query(models2.Team).filter(models2.Team.id == team_id).delete()
+        session.query(models2.Topic).filter(
+            models2.Topic.product_id == product_id
+        ).delete()
+        session.query(models2.Product).filter(models2.Product.id == product_id).delete()
+        session.commit()
+        session.close()
+
+    print(
+        "jobstates: %s, files: %s, requests: %s" % (nb_rows, 3 * nb_rows, nb_requests)
+    )
+    print("orm:        %.1f ms/request" % orm)
+    print("postgresql: %.1f ms/request (x%.1f)" % (postgresql, orm / postgresql))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the JSON encoder backends on pages of jobs and components, either
+serialized (UUID and datetime already converted to strings) or as raw rows
+holding UUID and datetime objects.
+
+The documents are encoded like flask.json.dumps does, orjson must be
+installed.
+"""
+
+import datetime
+import json
+import sys
+import timeit
+import uuid
+
+from dci.common import utils
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+def build_component():
+    return {
+        "id": uuid.uuid4(),
+        "created_at": _now(),
+        "updated_at": _now(),
+        "released_at": _now(),
+        "etag": "4e09b7f1d9b4c5b2f0e8d6a1c3b5e7f9",
+        "name": "RHEL-8.4.0-20210503.1",
+        "type": "compose",
+        "canonical_project_name": "RHEL-8.4.0-20210503.1",
+        "url": "http://download.example.com/rhel-8/RHEL-8.4.0-20210503.1",
+        "data": {"path": "rhel-8/RHEL-8.4.0-20210503.1"},
+        "tags": ["build:ga", "kernel:4.18.0-305"],
+        "title": None,
+        "message": None,
+        "topic_id": uuid.uuid4(),
+        "team_id": None,
+        "state": "active",
+    }
+
+
+def build_job(components):
+    job = {
+        "id": uuid.uuid4(),
+        "created_at": _now(),
+        "updated_at": _now(),
+        "etag": "4e09b7f1d9b4c5b2f0e8d6a1c3b5e7f9",
+        "name": "openshift-vanilla",
+        "comment": "daily run",
+        "status": "success",
+        "status_reason": None,
+        "configuration": "baremetal",
+        "url": "https://github.com/redhat-cip/dci-openshift-agent",
+        "tags": ["daily", "ocp-4.8"],
+        "duration": 3600,
+        "user_agent": "python-dciclient_2.5.0",
+        "client_version": "2.5.0",
+        "previous_job_id": uuid.uuid4(),
+        "update_previous_job_id": None,
+        "topic_id": uuid.uuid4(),
+        "remoteci_id": uuid.uuid4(),
+        "team_id": uuid.uuid4(),
+        "product_id": uuid.uuid4(),
+        "pipeline_id": None,
+        "state": "active",
+    }
+    job["components"] = components
+    job["results"] = [
+        {
+            "id": uuid.uuid4(),
+            "created_at": _now(),
+            "updated_at": _now(),
+            "name": "result %s" % i,
+            "total": 1000,
+            "success": 980,
+            "skips": 10,
+            "failures": 5,
+            "errors": 5,
+            "regressions": 0,
+            "successfixes": 0,
+            "time": 3600000,
+            "job_id": job["id"],
+            "file_id": uuid.uuid4(),
+        }
+        for i in range(5)
+    ]
+    return job
+
+
+def serialized(document):
+    return json.loads(json.dumps(document, cls=utils.JSONEncoder))
+
+
+def encode(encoder, document):
+    # flask.json.dumps with the default configuration
+    return json.dumps(document, cls=encoder, sort_keys=True)
+
+
+def main(nb_rows=200, number=50):
+    if utils.orjson is None:
+        sys.exit("orjson is not installed")
+
+    components = [build_component() for _ in range(nb_rows)]
+    jobs = [build_job(components[:5]) for _ in range(nb_rows)]
+    payloads = [
+        ("jobs rows", {"jobs": jobs, "_meta": {"count": nb_rows}}),
+        ("jobs serialized", serialized({"jobs": jobs, "_meta": {"count": nb_rows}})),
+        ("components rows", {"components": components}),
+        ("components serialized", serialized({"components": components})),
+    ]
+
+    print("pages of %s rows, %s runs" % (nb_rows, number))
+    for name, payload in payloads:
+        assert json.loads(encode(utils.JSONEncoder, payload)) == json.loads(
+            encode(utils.ORJSONEncoder, payload)
+        )
+        results = []
+        for encoder in (utils.JSONEncoder, utils.ORJSONEncoder):
+            duration = timeit.timeit(lambda: encode(encoder, payload), number=number)
+            results.append(duration * 1000 / number)
+        print(
+            "%-22s json: %7.2f ms  orjson: %6.2f ms  speedup: x%.1f"
+            % (name, results[0], results[1], results[0] / results[1])
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
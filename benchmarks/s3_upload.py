@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the throughput of the S3 store uploads of a large object, sent in
+a single request and in parts with an increasing concurrency.
+
+The store is configured like the API, from S3_ENDPOINT_URL and the AWS_*
+variables.
+"""
+
+import io
+import os
+import sys
+import time
+
+from dci import dci_config
+
+
+def run(store, data, part_size, max_concurrency):
+    store.part_size = part_size
+    store.max_concurrency = max_concurrency
+    filename = "bench-s3-upload"
+    start = time.time()
+    store.upload("files", filename, io.BytesIO(data))
+    elapsed = time.time() - start
+    store.delete("files", filename)
+    return len(data) / elapsed / 1024 / 1024
+
+
+def main(size_mb=128, part_size_mb=8):
+    store = dci_config.get_store()
+    data = os.urandom(size_mb * 1024 * 1024)
+    part_size = part_size_mb * 1024 * 1024
+
+    print("object: %s MB, parts: %s MB" % (size_mb, part_size_mb))
+    single = run(store, data, len(data) + 1, 1)
+    print("single request:     %.1f MB/s" % single)
+    for max_concurrency in (1, 4, 8):
+        multipart = run(store, data, part_size, max_concurrency)
+        print(
+            "parts, %s at a time: %.1f MB/s (x%.1f)"
+            % (max_concurrency, multipart, multipart / single)
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the compiled Mixin.serialize with the previous implementation which
+inspected every attribute value, on pages of synthetic jobs embedding their
+results, components, topic, team and remoteci like GET /jobs does.
+
+No database is needed, the jobs are transient objects.
+"""
+
+import datetime
+import sys
+import timeit
+import uuid
+
+from sqlalchemy.orm.attributes import set_committed_value
+
+from dci.db import declarative
+from dci.db import models2
+
+
+def legacy_serialize(self, ignore_columns=[]):
+    def _get_nested_columns():
+        _res = {}
+        for ic in ignore_columns:
+            if "." in ic:
+                k, v = ic.split(".")
+                if k not in _res:
+                    _res[k] = [v]
+                else:
+                    _res[k].append(v)
+        return _res
+
+    nested_ignore_columns = []
+    if ignore_columns:
+        nested_ignore_columns = _get_nested_columns()
+    _dict = {}
+    _attrs = self.__dict__.keys()
+
+    for attr in _attrs:
+        if attr in ignore_columns:
+            continue
+        attr_obj = getattr(self, attr)
+        if isinstance(attr_obj, list):
+            _dict[attr] = []
+            for ao in attr_obj:
+                _ignore_columns = []
+                if attr in nested_ignore_columns:
+                    _ignore_columns = nested_ignore_columns[attr]
+                if isinstance(ao, declarative.Mixin):
+                    _dict[attr].append(legacy_serialize(ao, _ignore_columns))
+                else:
+                    _dict[attr].append(ao)
+        elif isinstance(attr_obj, declarative.Mixin):
+            _ignore_columns = []
+            if attr in nested_ignore_columns:
+                _ignore_columns = nested_ignore_columns[attr]
+            _dict[attr] = legacy_serialize(attr_obj, _ignore_columns)
+        elif isinstance(attr_obj, uuid.UUID):
+            _dict[attr] = str(attr_obj)
+        elif isinstance(attr_obj, datetime.datetime):
+            _dict[attr] = attr_obj.isoformat()
+        elif not attr.startswith("_"):
+            _dict[attr] = self.__dict__[attr]
+    return _dict
+
+
+def _common_values(etag=True):
+    now = datetime.datetime.utcnow()
+    values = {"id": uuid.uuid4(), "created_at": now, "updated_at": now}
+    if etag:
+        values["etag"] = "4e09b7f1d9b4c5b2f0e8d6a1c3b5e7f9"
+    return values
+
+
+def build_jobs(nb_jobs, nb_components=5, nb_results=5):
+    team = models2.Team(name="team", state="active", **_common_values())
+    topic = models2.Topic(
+        name="topic", component_types=["ocp"], state="active", **_common_values()
+    )
+    remoteci = models2.Remoteci(
+        name="remoteci", team_id=team.id, data={}, state="active", **_common_values()
+    )
+    components = [
+        models2.Component(
+            name="component %s" % i,
+            type="type%s" % i,
+            topic_id=topic.id,
+            tags=["build:ga"],
+            data={},
+            state="active",
+            released_at=datetime.datetime.utcnow(),
+            **_common_values()
+        )
+        for i in range(nb_components)
+    ]
+    jobs = []
+    for _ in range(nb_jobs):
+        job = models2.Job(
+            name="job",
+            comment="comment",
+            status="success",
+            topic_id=topic.id,
+            remoteci_id=remoteci.id,
+            team_id=team.id,
+            tags=["daily"],
+            data={"key": "value"},
+            state="active",
+            duration=3600,
+            **_common_values()
+        )
+        # set the relationships like a query loading them would, without
+        # triggering the backrefs
+        set_committed_value(job, "topic", topic)
+        set_committed_value(job, "team", team)
+        set_committed_value(job, "remoteci", remoteci)
+        set_committed_value(job, "components", list(components))
+        results = [
+            models2.TestsResult(
+                name="result %s" % i,
+                total=100,
+                success=90,
+                failures=5,
+                errors=5,
+                skips=0,
+                time=1000,
+                job_id=job.id,
+                file_id=uuid.uuid4(),
+                **_common_values(etag=False)
+            )
+            for i in range(nb_results)
+        ]
+        set_committed_value(job, "results", results)
+        jobs.append(job)
+    return jobs
+
+
+def main(nb_jobs=200, number=20):
+    jobs = build_jobs(nb_jobs)
+    for job in jobs:
+        assert job.serialize(["data"]) == legacy_serialize(job, ["data"])
+
+    legacy = timeit.timeit(
+        lambda: [legacy_serialize(j, ["data"]) for j in jobs], number=number
+    )
+    compiled = timeit.timeit(
+        lambda: [j.serialize(["data"]) for j in jobs], number=number
+    )
+
+    print("page of %s jobs, %s runs" % (nb_jobs, number))
+    print("legacy serialize:   %.2f ms/page" % (legacy * 1000 / number))
+    print("compiled serialize: %.2f ms/page" % (compiled * 1000 / number))
+    print("speedup: x%.1f" % (legacy / compiled))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -72,6 +72,7 @@ sed -i "s/==/>=/g" requirements.txt
 %py3_install
 install -d %{buildroot}/%{_datarootdir}/dci-api
 install -d %{buildroot}%{_sysconfdir}/dci-api
+install -d %{buildroot}%{_sharedstatedir}/dci-control-server/amqp-spool
 # NOTE(Gonéri): Preserve the original location of the wsgi.py file
 %{__ln_s} %{python3_sitelib}/dci/wsgi.py %{buildroot}/%{_datarootdir}/dci-api/wsgi.py
 # NOTE(Gonéri): Preserve the content of the configuration file when we
@@ -80,16 +81,20 @@ mv %{buildroot}/%{python3_sitelib}/dci/settings.py %{buildroot}/%{_sysconfdir}/d
 %{__ln_s} %{_sysconfdir}/dci-api/settings.py %{buildroot}/%{python3_sitelib}/dci/settings.py
 rm -rf %{buildroot}/%{python3_sitelib}/sample
 install -p -D -m 644 dci/systemd/dci-worker.service %{buildroot}%{_unitdir}/dci-worker.service
+install -p -D -m 644 dci/systemd/dci-outbox-dispatcher.service %{buildroot}%{_unitdir}/dci-outbox-dispatcher.service
 
 %files
 %{_bindir}/dci-dbsync
 %{_bindir}/dci-dbinit
+%{_bindir}/dci-outbox-dispatcher
 %license LICENSE
 %{python3_sitelib}/dci
 %{python3_sitelib}/*.egg-info
 %{_unitdir}/dci-worker.service
+%{_unitdir}/dci-outbox-dispatcher.service
 %config(noreplace) %{_sysconfdir}/dci-api/settings.py
 %{_datarootdir}/dci-api/wsgi.py
+%dir %{_sharedstatedir}/dci-control-server/amqp-spool
 # NOTE(Gonéri): the content of settings.py is likely to evolve.
 # We don't want to end up with outdated cache on the hard drive.
 %exclude %{_sysconfdir}/dci-api/settings.py?
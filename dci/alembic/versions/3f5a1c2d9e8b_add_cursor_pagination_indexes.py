@@ -0,0 +1,44 @@
+#
+# Copyright (C) 2026 Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Add cursor pagination indexes
+
+Revision ID: 3f5a1c2d9e8b
+Revises: 4ff34474b4fd
+Create Date: 2026-10-18 09:12:43.201542
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "3f5a1c2d9e8b"
+down_revision = "4ff34474b4fd"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index("components_created_at_idx", "components", ["created_at"])
+    op.create_index("components_released_at_idx", "components", ["released_at"])
+    op.create_index("logs_created_at_idx", "logs", ["created_at"])
+    op.create_index("jobs_events_created_at_idx", "jobs_events", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("jobs_events_created_at_idx", table_name="jobs_events")
+    op.drop_index("logs_created_at_idx", table_name="logs")
+    op.drop_index("components_released_at_idx", table_name="components")
+    op.drop_index("components_created_at_idx", table_name="components")
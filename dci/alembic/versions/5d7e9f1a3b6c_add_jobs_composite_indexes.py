@@ -0,0 +1,51 @@
+#
+# Copyright (C) 2026 Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Add jobs composite indexes
+
+Revision ID: 5d7e9f1a3b6c
+Revises: 8c4e2b7a1d3f
+Create Date: 2026-10-18 14:21:45.102938
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "5d7e9f1a3b6c"
+down_revision = "8c4e2b7a1d3f"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index(
+        "jobs_remoteci_id_topic_id_created_at_idx",
+        "jobs",
+        ["remoteci_id", "topic_id", sa.text("created_at DESC")],
+        postgresql_where=sa.text("jobs.state != 'archived'"),
+    )
+    op.create_index(
+        "jobs_team_id_created_at_idx",
+        "jobs",
+        ["team_id", sa.text("created_at DESC")],
+        postgresql_where=sa.text("jobs.state != 'archived'"),
+    )
+
+
+def downgrade():
+    op.drop_index("jobs_team_id_created_at_idx", table_name="jobs")
+    op.drop_index("jobs_remoteci_id_topic_id_created_at_idx", table_name="jobs")
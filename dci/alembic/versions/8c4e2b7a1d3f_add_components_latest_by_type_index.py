@@ -0,0 +1,46 @@
+#
+# Copyright (C) 2026 Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Add components latest by type index
+
+Revision ID: 8c4e2b7a1d3f
+Revises: 3f5a1c2d9e8b
+Create Date: 2026-10-18 11:02:17.538214
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "8c4e2b7a1d3f"
+down_revision = "3f5a1c2d9e8b"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index(
+        "components_latest_by_type_idx",
+        "components",
+        ["topic_id", "type", sa.text("created_at DESC")],
+        postgresql_where=sa.text(
+            "components.state = 'active' AND components.team_id is NULL"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_index("components_latest_by_type_idx", table_name="components")
@@ -35,8 +35,14 @@ def get_logs(user):
         raise dci_exc.Unauthorized()
 
     query = declarative.handle_args(query, models2.Log, args)
-    nb_logs = query.count()
-    query = declarative.handle_pagination(query, args)
+    nb_logs = declarative.get_count(query, args)
+    query = declarative.handle_pagination(query, args, models2.Log)
+    logs = query.all()
+
+    _meta = {"count": nb_logs}
+    next_cursor = declarative.get_cursor_builder(models2.Log, args)
+    if next_cursor:
+        _meta["next"] = next_cursor(logs[-1] if logs else None, len(logs))
 
     audits = [
         {
@@ -45,6 +51,6 @@ def get_logs(user):
             "user_id": audit.user_id,
             "action": audit.action,
         }
-        for audit in query.all()
+        for audit in logs
     ]
-    return flask.jsonify({"audits": audits, "_meta": {"count": nb_logs}})
+    return flask.jsonify({"audits": audits, "_meta": _meta})
@@ -14,12 +14,25 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import hashlib
+import io
+import os
+
 import flask
+from werkzeug import http
 
 from sqlalchemy import orm
 from sqlalchemy import exc
+from sqlalchemy import func
+from sqlalchemy import sql
+from sqlalchemy import Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from dci.common import exceptions as dci_exc
 from dci.common import utils
+from dci.stores import files_utils
+
+# Number of rows fetched at once by the streamed listings
+STREAM_YIELD_PER = 100
 
 
 def get_resources_orm(table, filters=[], options=[]):
@@ -57,6 +70,56 @@ def get_resource_orm(table, id, etag=None, options=[]):
         )
 
 
+def get_embeds_version(table, whereclause, column="updated_at"):
+    """Return the scalar subquery of the version of the rows of table that
+    a GET document embeds: their last update date and a digest of their
+    ids, which changes when a row is added or removed."""
+    ids = func.string_agg(sql.cast(table.id, Text), aggregate_order_by(",", table.id))
+    return (
+        sql.select([func.concat(func.max(getattr(table, column)), func.md5(ids))])
+        .where(whereclause)
+        .as_scalar()
+    )
+
+
+def get_validator(query, verify_access=None):
+    """Return the entity tag of the GET document of the resource selected
+    by query, None if there is no such resource.
+
+    The query selects the etag of the resource, the versions of the rows
+    its document embeds (see get_embeds_version) and the columns
+    verify_access needs to check the access to the resource, so that the
+    relationships are loaded only when the document has changed. The
+    entity tag is made of the etag, which stays the If-Match token, and
+    of a digest of the whole selected row.
+    """
+    resource = query.first()
+    if resource is None:
+        return None
+    if verify_access is not None:
+        verify_access(resource)
+    digest = hashlib.md5(repr(tuple(resource)).encode("utf-8")).hexdigest()
+    return "%s-%s" % (resource.etag, digest)
+
+
+def get_validator_headers(validator):
+    # the document also changes with the embedded resources, the tag is weak
+    return {"ETag": http.quote_etag(validator, weak=True)}
+
+
+def get_not_modified_response(validator):
+    """Return a 304 response when the If-None-Match header of the request
+    matches the validator of the resource, None otherwise."""
+    if validator is None or not flask.request.if_none_match.contains_weak(validator):
+        return None
+    return flask.Response(
+        None,
+        304,
+        headers=get_validator_headers(validator),
+        content_type="application/json",
+    )
+
+
 def update_resource_orm(resource, data):
     for k, v in data.items():
         setattr(resource, k, v)
@@ -96,26 +159,93 @@ def create_resource_orm(table, data):
         )
 
 
+def get_upload_stream():
+    """Return the request body as a files_utils.ChecksumReader, the upload
+    is streamed to the store instead of being buffered in memory."""
+    max_size = flask.current_app.config["MAX_CONTENT_LENGTH"]
+    content_length = flask.request.content_length
+    if max_size is not None and content_length is not None:
+        if content_length > max_size:
+            raise dci_exc.DCIException(
+                "File too large, the maximum size is %s bytes" % max_size,
+                status_code=413,
+            )
+    return files_utils.ChecksumReader(flask.request.stream, max_size)
+
+
+def send_store_file(container_name, file_path, mimetype, **kwargs):
+    """Send a file of the store, the kwargs are passed to flask.send_file.
+
+    The files of the file system store are sent from their path: the WSGI
+    server copies them to the socket with sendfile, or the fronting web
+    server sends them when USE_X_SENDFILE or X_ACCEL_REDIRECT_LOCATION is
+    set. The other stores are read from their stream."""
+    mimetype = mimetype or "application/octet-stream"
+    store = flask.g.store
+    path = store.get_path(container_name, file_path)
+    if path is None:
+        _, file_descriptor = store.get(container_name, file_path)
+        return flask.send_file(file_descriptor, mimetype=mimetype, **kwargs)
+
+    location = flask.current_app.config.get("X_ACCEL_REDIRECT_LOCATION")
+    if location:
+        # send_file builds the headers, nginx sends the content
+        response = flask.send_file(io.BytesIO(), mimetype=mimetype, **kwargs)
+        response.headers["X-Accel-Redirect"] = "%s/%s" % (
+            location.rstrip("/"),
+            os.path.relpath(path, store.path),
+        )
+        return response
+    return flask.send_file(path, mimetype=mimetype, **kwargs)
+
+
 def get_archived_resources_query(table):
     return flask.g.session.query(table).filter(table.state == "archived")
 
 
+def stream_resources(resources_name, rows, serialize, meta=None, next_cursor=None):
+    """Build a response streaming {resources_name: [...], "_meta": meta}.
+
+    The rows are serialized and encoded one by one while the response is
+    sent, so the whole list is never held in memory. The query is executed
+    before returning so its errors are still reported with a proper status
+    code. When meta is None, it is set to the number of streamed rows.
+    next_cursor is the cursor builder of declarative.get_cursor_builder, it
+    sets "next" in meta.
+    """
+    rows = iter(rows)
+
+    def generate():
+        count = 0
+        row = None
+        chunk = ['{"%s": [' % resources_name]
+        for row in rows:
+            if count:
+                chunk.append(",")
+            chunk.append(flask.json.dumps(serialize(row)))
+            count += 1
+            if count % STREAM_YIELD_PER == 0:
+                yield "".join(chunk)
+                chunk = []
+        _meta = {"count": count} if meta is None else dict(meta)
+        if next_cursor is not None:
+            _meta["next"] = next_cursor(row, count)
+        chunk.append('], "_meta": %s}' % flask.json.dumps(_meta))
+        yield "".join(chunk)
+
+    return flask.Response(
+        flask.stream_with_context(generate()), 200, content_type="application/json"
+    )
+
+
 def get_to_purge_archived_resources(user, table):
     """List the entries to be purged from the database."""
 
     if user.is_not_super_admin():
         raise dci_exc.Unauthorized()
 
-    archived_resources = [
-        r.serialize() for r in get_archived_resources_query(table).all()
-    ]
-
-    return flask.jsonify(
-        {
-            table.__tablename__: archived_resources,
-            "_meta": {"count": len(archived_resources)},
-        }
-    )
+    query = get_archived_resources_query(table).yield_per(STREAM_YIELD_PER)
+    return stream_resources(table.__tablename__, query, lambda r: r.serialize())
 
 
 def purge_archived_resources(user, table):
@@ -138,14 +268,8 @@ def get_resources_to_purge_orm(user, table):
         raise dci_exc.Unauthorized()
 
     query = flask.g.session.query(table).filter(table.state == "archived")
-    archived_resources = [resource.serialize() for resource in query.all()]
-
-    return flask.jsonify(
-        {
-            table.__tablename__: archived_resources,
-            "_meta": {"count": len(archived_resources)},
-        }
-    )
+    query = query.yield_per(STREAM_YIELD_PER)
+    return stream_resources(table.__tablename__, query, lambda r: r.serialize())
 
 
 def purge_archived_resources_orm(user, table):
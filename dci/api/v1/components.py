@@ -14,7 +14,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import io
 import os
 
 import flask
@@ -27,7 +26,9 @@ from dci.api.v1 import base
 from dci.api.v1 import permissions
 from dci.api.v1 import utils as v1_utils
 from dci.api.v2 import components as components_v2
+from dci import dci_config
 from dci import decorators
+from dci.common import cache
 from dci.common import exceptions as dci_exc
 from dci.common.schemas import (
     check_json_is_valid,
@@ -44,9 +45,21 @@ from dci.db import migration_components
 from dci.stores import files_utils
 import sqlalchemy.orm as sa_orm
 
-
 logger = logging.getLogger(__name__)
 
+# ids of the latest exported component of each type, keyed by
+# (topic_id, component types), so that the jobs scheduled in a burst on the
+# same topic share the lookup
+latest_components_cache = cache.TTLCache(
+    maxsize=dci_config.CONFIG["LATEST_COMPONENTS_CACHE_SIZE"],
+    ttl=dci_config.CONFIG["LATEST_COMPONENTS_CACHE_TTL"],
+)
+
+
+def invalidate_latest_components(*topics_ids):
+    topics_ids = set(str(t) for t in topics_ids)
+    latest_components_cache.evict(lambda key, _: key[0] in topics_ids)
+
 
 @api.route("/components", methods=["POST"])
 @decorators.login_required
@@ -77,6 +90,7 @@ def create_components(user):
     values["uid"] = values.get("uid") or component_info["uid"]
 
     c = base.create_resource_orm(models2.Component, values)
+    invalidate_latest_components(c["topic_id"])
 
     # todo(yassine): move this logic the event handler
     # just send a "component_created" event with the component payload
@@ -106,9 +120,11 @@ def update_components(user, c_id):
 
     values = clean_json_with_schema(update_component_schema, flask.request.json)
     values["type"] = values.get("type", component.type).lower()
+    initial_topic_id = component.topic_id
     base.update_resource_orm(component, values)
 
     component = base.get_resource_orm(models2.Component, c_id)
+    invalidate_latest_components(initial_topic_id, component.topic_id)
     new_component_state = component.state
 
     # todo(yassine): move this logic the event handler
@@ -157,12 +173,21 @@ def get_all_components(user, topics_ids):
         )
 
     query = declarative.handle_args(query, models2.Component, args)
-    nb_components = query.count()
-    query = declarative.handle_pagination(query, args)
-
-    components = [component.serialize() for component in query.all()]
-
-    return flask.jsonify({"components": components, "_meta": {"count": nb_components}})
+    query = declarative.handle_embed(
+        query, args, {"files": sa_orm.selectinload("files")}, default_embeds=[]
+    )
+    query = declarative.handle_fields(query, models2.Component, args)
+    nb_components = declarative.get_count(query, args)
+    query = declarative.handle_pagination(query, args, models2.Component)
+    query = query.yield_per(base.STREAM_YIELD_PER)
+
+    return base.stream_resources(
+        "components",
+        query,
+        lambda component: component.serialize(),
+        meta={"count": nb_components},
+        next_cursor=declarative.get_cursor_builder(models2.Component, args),
+    )
 
 
 @api.route("/components", methods=["GET"])
@@ -175,6 +200,40 @@ def get_components(user):
 @api.route("/components/<uuid:c_id>", methods=["GET"])
 @decorators.login_required
 def get_component_by_id(user, c_id):
+    Component = models2.Component
+    _JJC = models2.JOIN_JOBS_COMPONENTS
+    is_restricted = (
+        user.is_not_super_admin() and user.is_not_read_only_user() and user.is_not_epm()
+    )
+    jobs_filter = [
+        models2.Job.state != "archived",
+        _JJC.c.job_id == models2.Job.id,
+        _JJC.c.component_id == Component.id,
+    ]
+    if is_restricted:
+        jobs_filter.append(models2.Job.team_id.in_(user.teams_ids))
+    validator = base.get_validator(
+        flask.g.session.query(
+            Component.etag,
+            Component.updated_at,
+            base.get_embeds_version(
+                models2.Componentfile,
+                models2.Componentfile.component_id == Component.id,
+            ),
+            base.get_embeds_version(models2.Job, sql.and_(*jobs_filter)),
+            Component.team_id,
+            Component.topic_id,
+        ).filter(Component.id == c_id, Component.state != "archived"),
+        (
+            (lambda c: permissions.verify_access_to_component(user, c))
+            if is_restricted
+            else None
+        ),
+    )
+    not_modified = base.get_not_modified_response(validator)
+    if not_modified is not None:
+        return not_modified
+
     component = base.get_resource_orm(
         models2.Component, c_id, options=[sa_orm.selectinload("files")]
     )
@@ -188,7 +247,7 @@ def get_component_by_id(user, c_id):
         )
     )
 
-    if user.is_not_super_admin() and user.is_not_read_only_user() and user.is_not_epm():
+    if is_restricted:
         permissions.verify_access_to_component(user, component)
         component_jobs_query = component_jobs_query.filter(
             models2.Job.team_id.in_(user.teams_ids)
@@ -199,7 +258,7 @@ def get_component_by_id(user, c_id):
     return flask.Response(
         json.dumps({"component": serialized_component}),
         200,
-        headers={"ETag": serialized_component["etag"]},
+        headers=base.get_validator_headers(validator),
         content_type="application/json",
     )
 
@@ -211,6 +270,7 @@ def delete_component_by_id(user, c_id):
     component = base.get_resource_orm(models2.Component, c_id, if_match_etag)
     permissions.can_delete_component(user, component)
     base.update_resource_orm(component, {"state": "archived"})
+    invalidate_latest_components(component.topic_id)
 
     return flask.Response(None, 204, content_type="application/json")
 
@@ -230,7 +290,7 @@ def list_components_files(user, c_id):
         )
     )
 
-    nb_componentfiles = query.count()
+    nb_componentfiles = declarative.get_count(query, args)
 
     query = declarative.handle_args(query, models2.Componentfile, args)
 
@@ -290,8 +350,7 @@ def download_component_file(user, c_id, f_id):
     # Check if file exist on the storage engine
     store.head("components", file_path)
 
-    _, file_descriptor = store.get("components", file_path)
-    return flask.send_file(file_descriptor, mimetype=componentfile.mime)
+    return base.send_store_file("components", file_path, componentfile.mime)
 
 
 @api.route("/components/<uuid:c_id>/files", methods=["POST"])
@@ -307,7 +366,12 @@ def upload_component_file(user, c_id):
 
     file_id = utils.gen_uuid()
     file_path = files_utils.build_file_path(component.topic_id, c_id, file_id)
-    store.upload("components", file_path, io.BytesIO(flask.request.data))
+    try:
+        store.upload("components", file_path, base.get_upload_stream())
+    except Exception:
+        # do not leave a partial upload behind
+        store.delete("components", file_path)
+        raise
     s_file = store.head("components", file_path)
 
     values = dict.fromkeys(["md5", "mime", "component_id", "name"])
@@ -352,40 +416,36 @@ def get_component_types_from_topic(topic_id):
 def get_last_components_by_type(component_types, topic_id, session=None):
     """For each component type of a topic, get the last one."""
     session = session or flask.g.session
-    _components_ids = []
+    components = (
+        session.query(models2.Component)
+        .filter(
+            sql.and_(
+                models2.Component.type.in_(component_types),
+                models2.Component.topic_id == topic_id,
+                models2.Component.state == "active",
+                models2.Component.team_id == None,  # noqa
+            )
+        )
+        .distinct(models2.Component.type)
+        .order_by(models2.Component.type, models2.Component.created_at.desc())
+        .all()
+    )
+    components_by_type = {c.type: c for c in components}
+
     _components = []
     for ct in component_types:
-        try:
-            component = (
-                session.query(models2.Component)
-                .filter(
-                    sql.and_(
-                        models2.Component.type == ct,
-                        models2.Component.topic_id == topic_id,
-                        models2.Component.state == "active",
-                        models2.Component.team_id == None,  # noqa
-                    )
-                )
-                .order_by(models2.Component.created_at.desc())
-                .first()
-            )
-        except sa_orm.exc.NoResultFound:
-            raise dci_exc.DCIException(
-                message="component of type %s not found or not exported" % ct,
-                status_code=404,
-            )
+        component = components_by_type.get(ct)
         if component is None:
             msg = 'Component of type "%s" not found or not exported.' % ct
             raise dci_exc.DCIException(msg, status_code=412)
 
-        if str(component.id) in _components_ids:
+        if component in _components:
             msg = "Component types %s malformed: type %s duplicated." % (
                 component_types,
                 ct,
             )
             raise dci_exc.DCIException(msg, status_code=412)
         _components.append(component)
-        _components_ids.append(str(component.id))
     return _components
 
 
@@ -431,7 +491,14 @@ def verify_and_get_components_ids(
 
 def get_schedule_components_ids(topic_id, component_types, components_ids):
     if components_ids == []:
-        return [c.id for c in get_last_components_by_type(component_types, topic_id)]
+        cache_key = (str(topic_id), tuple(component_types))
+        last_components_ids = latest_components_cache.get(cache_key)
+        if last_components_ids is None:
+            last_components_ids = [
+                c.id for c in get_last_components_by_type(component_types, topic_id)
+            ]
+            latest_components_cache.set(cache_key, last_components_ids)
+        return list(last_components_ids)
     return verify_and_get_components_ids(topic_id, components_ids, component_types)
 
 
@@ -445,8 +512,12 @@ def get_to_purge_archived_components(user):
 @decorators.login_required
 def purge_archived_components(user):
     # get all archived components
-    archived_components = base.get_resources_to_purge_orm(user, models2.Component).json[
-        "components"
+    if user.is_not_super_admin():
+        raise dci_exc.Unauthorized()
+
+    archived_components = [
+        c.serialize()
+        for c in base.get_archived_resources_query(models2.Component).all()
     ]
 
     store = flask.g.store
@@ -20,6 +20,7 @@ from flask import json
 from dci.api.v1 import api
 from dci.api.v1 import base
 from dci.api.v1 import utils as v1_utils
+from dci import auth_mechanism
 from dci import decorators
 from dci.common import exceptions as dci_exc
 from dci.common.schemas import (
@@ -77,7 +78,7 @@ def get_all_feeders(user, t_id=None):
     query = query.filter(models2.Feeder.state != "archived")
 
     query = declarative.handle_args(query, models2.Feeder, args)
-    nb_feeders = query.count()
+    nb_feeders = declarative.get_count(query, args)
     query = declarative.handle_pagination(query, args)
 
     feeders = [feeder.serialize() for feeder in query.all()]
@@ -114,6 +115,7 @@ def put_feeder(user, feeder_id):
         raise dci_exc.Unauthorized()
 
     base.update_resource_orm(feeder, values)
+    auth_mechanism.invalidate_hmac_identity("feeder", feeder_id)
 
     feeder = base.get_resource_orm(models2.Feeder, feeder_id)
 
@@ -135,6 +137,7 @@ def delete_feeder_by_id(user, feeder_id):
         raise dci_exc.Unauthorized()
 
     base.update_resource_orm(feeder, {"state": "archived"})
+    auth_mechanism.invalidate_hmac_identity("feeder", feeder_id)
     return flask.Response(None, 204, content_type="application/json")
 
 
@@ -160,6 +163,7 @@ def put_api_secret_feeder(user, feeder_id):
         raise dci_exc.Unauthorized()
 
     base.update_resource_orm(feeder, {"api_secret": signature.gen_secret()})
+    auth_mechanism.invalidate_hmac_identity("feeder", feeder_id)
 
     feeder = base.get_resource_orm(models2.Feeder, feeder_id)
     return flask.Response(
@@ -15,8 +15,6 @@
 # under the License.
 import base64
 import datetime
-import gc
-import io
 import xml.etree.ElementTree
 from dci.common.time import get_job_duration
 
@@ -171,10 +169,14 @@ def create_files(user):
     file_path = files_utils.build_file_path(job.team_id, values["job_id"], file_id)
 
     store = flask.g.store
-    store.upload("files", file_path, io.BytesIO(flask.request.data))
+    upload_stream = base.get_upload_stream()
+    try:
+        store.upload("files", file_path, upload_stream)
+    except Exception:
+        # do not leave a partial upload behind
+        store.delete("files", file_path)
+        raise
     logger.info("store upload %s (%s)" % (values["name"], file_id))
-    s_file = store.head("files", file_path)
-    logger.info("store head %s (%s)" % (values["name"], file_id))
     etag = utils.gen_etag()
     values.update(
         {
@@ -182,8 +184,8 @@ def create_files(user):
             "created_at": datetime.datetime.utcnow().isoformat(),
             "updated_at": datetime.datetime.utcnow().isoformat(),
             "team_id": job.team_id,
-            "md5": None,
-            "size": s_file.get("content-length", s_file.get("ContentLength")),
+            "md5": upload_stream.md5,
+            "size": upload_stream.size,
             "state": "active",
             "etag": etag,
         }
@@ -195,7 +197,6 @@ def create_files(user):
     # Update job duration if it's jobstate's file
     if values.get("jobstate_id"):
         base.update_resource_orm(job, {"duration": get_job_duration(job)})
-    gc.collect()
 
     if new_file["mime"] == "application/junit":
         try:
@@ -228,7 +229,7 @@ def get_all_files(user, job_id):
     )
 
     query = declarative.handle_args(query, models2.File, args)
-    nb_files = query.count()
+    nb_files = declarative.get_count(query, args)
     query = declarative.handle_pagination(query, args)
 
     files = [f.serialize() for f in query.all()]
@@ -248,14 +249,17 @@ def get_file_by_id(user, file_id):
     )
 
 
-def get_file_descriptor(file_object):
-    store = flask.g.store
+def get_file_path(file_object):
     file_path = files_utils.build_file_path(
         file_object.team_id, file_object.job_id, file_object.id
     )
     # Check if file exist on the storage engine
-    store.head("files", file_path)
-    _, file_descriptor = store.get("files", file_path)
+    flask.g.store.head("files", file_path)
+    return file_path
+
+
+def get_file_descriptor(file_object):
+    _, file_descriptor = flask.g.store.get("files", get_file_path(file_object))
     return file_descriptor
 
 
@@ -269,9 +273,9 @@ def get_file_content(user, file_id):
         and user.is_not_epm()
     ):
         raise dci_exc.Unauthorized()
-    file_descriptor = get_file_descriptor(file)
-    return flask.send_file(
-        file_descriptor,
+    return base.send_store_file(
+        "files",
+        get_file_path(file),
         mimetype=file.mime or "text/plain",
         as_attachment=True,
         attachment_filename=file.name.replace(" ", "_"),
@@ -347,8 +351,13 @@ def get_to_purge_archived_files(user):
 @api.route("/files/purge", methods=["POST"])
 @decorators.login_required
 def purge_archived_files(user):
+    if user.is_not_super_admin():
+        raise dci_exc.Unauthorized()
+
     # get all archived files
-    archived_files = base.get_resources_to_purge_orm(user, models2.File).json["files"]
+    archived_files = [
+        f.serialize() for f in base.get_archived_resources_query(models2.File).all()
+    ]
     store = flask.g.store
 
     # for each file delete it from within a transaction
@@ -24,6 +24,7 @@ from dci.common import exceptions as dci_exc
 from dci.common.schemas import clean_json_with_schema, update_current_user_schema
 from dci.common import utils
 from dci.db import models2
+from dci import auth_mechanism
 from dci import decorators
 
 
@@ -95,6 +96,7 @@ def put_identity(user):
             sql.and_(models2.User.id == user.id, models2.User.etag == if_match_etag)
         ).update(new_values)
         flask.g.session.commit()
+        auth_mechanism.invalidate_user_identity(user.id)
     except Exception as e:
         flask.g.session.rollback()
         raise dci_exc.DCIException(message=str(e), status_code=409)
@@ -18,7 +18,10 @@ import flask
 from flask import json
 import logging
 from sqlalchemy import exc as sa_exc
+from sqlalchemy import func
 from sqlalchemy import sql
+from sqlalchemy import Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 import sqlalchemy.orm as sa_orm
 
 from dci.analytics import access_data_layer as a_d_l
@@ -28,7 +31,9 @@ from dci.api.v1 import components
 from dci.api.v1 import utils as v1_utils
 from dci.api.v1 import jobs_events
 from dci.api.v1 import notifications
+from dci import dci_config
 from dci import decorators
+from dci.common import admission
 from dci.common import exceptions as dci_exc
 from dci.common.time import get_utc_now
 from dci.common.schemas import (
@@ -49,12 +54,21 @@ from dci.api.v1 import files
 from dci.api.v1 import permissions
 from dci.api.v1 import jobstates
 
-
 logger = logging.getLogger(__name__)
 
+# the jobs creation endpoints are called in bursts by the remotecis when a
+# new component is released, bound how much of the process they can take
+schedule_admission = admission.AdmissionController(
+    max_concurrency=dci_config.CONFIG["SCHEDULE_MAX_CONCURRENCY"],
+    max_queued=dci_config.CONFIG["SCHEDULE_MAX_QUEUED"],
+    max_queued_per_key=dci_config.CONFIG["SCHEDULE_MAX_QUEUED_PER_TEAM"],
+    queue_timeout=dci_config.CONFIG["SCHEDULE_QUEUE_TIMEOUT"],
+)
+
 
 @api.route("/jobs", methods=["POST"])
 @decorators.login_required
+@decorators.admission_controlled(schedule_admission)
 def create_jobs(user):
     values = flask.request.json
     check_json_is_valid(create_job_schema, values)
@@ -67,6 +81,7 @@ def create_jobs(user):
 
 @api.route("/jobs/schedule", methods=["POST"])
 @decorators.login_required
+@decorators.admission_controlled(schedule_admission)
 def schedule_jobs(user):
     """Dispatch jobs to remotecis.
 
@@ -122,56 +137,29 @@ def internal_create_jobs(user, values, components_ids=None):
         }
     )
     values = utils._filter_empty_tags(values)
-    components_access_teams_ids = permissions.get_components_access_teams_ids(
-        user.teams_ids
-    )
     # schedule
     if components_ids is None:
         components_ids = values.pop("components_ids")
-        for c_id in components_ids:
-            c = base.get_resource_orm(models2.Component, c_id)
-            if (
-                c.team_id is not None
-                and c.team_id not in user.teams_ids
-                and c.team_id not in components_access_teams_ids
-            ):
-                logger.error(
-                    "c.team_id: %s, uer.teams_ids: %s, components_access_teams_ids: %s"
-                    % (c.team_id, user.teams_ids, components_access_teams_ids)
-                )
-                raise dci_exc.Unauthorized()
+        schedule = True
+    # create
+    else:
+        schedule = False
+
+    _verify_components_exist(components_ids)
+    unauthorized_components_ids = permissions.get_unauthorized_components_ids(
+        user.teams_ids, components_ids
+    )
+    if unauthorized_components_ids:
+        logger.error(
+            "components %s not accessible by the teams %s"
+            % (unauthorized_components_ids, user.teams_ids)
+        )
+        raise dci_exc.Unauthorized()
 
+    if schedule:
         values = _build_job(product_id, topic_id, remoteci, components_ids, values)
-    # create
     else:
-        base.create_resource_orm(models2.Job, values)
-        j = base.get_resource_orm(models2.Job, values["id"])
-        for cmpt_id in components_ids:
-            c = base.get_resource_orm(models2.Component, cmpt_id)
-            if (
-                c.team_id is not None
-                and c.team_id not in user.teams_ids
-                and c.team_id not in components_access_teams_ids
-            ):
-                logger.error(
-                    "c.team_id: %s, uer.teams_ids: %s, components_access_teams_ids: %s"
-                    % (c.team_id, user.teams_ids, components_access_teams_ids)
-                )
-                raise dci_exc.Unauthorized()
-
-        for cmpt_id in components_ids:
-            c = base.get_resource_orm(models2.Component, cmpt_id)
-            try:
-                j.components.append(c)
-                flask.g.session.add(j)
-                flask.g.session.commit()
-            except sa_exc.IntegrityError as e:
-                logger.error(str(e))
-                flask.g.session.rollback()
-                raise dci_exc.DCIException(
-                    message="conflict when adding component %s" % c.name,
-                    status_code=409,
-                )
+        _create_job(values, components_ids)
 
     job = a_d_l.get_job_by_id(flask.g.session, values["id"])
     logger.info("send notification message: job_started, job_id: %s" % values["id"])
@@ -195,27 +183,68 @@ def _build_job(product_id, topic_id, remoteci, components_ids, values):
     values.update(
         {"product_id": product_id, "topic_id": topic_id, "team_id": remoteci.team_id}
     )
-    base.create_resource_orm(models2.Job, values)
-    j = base.get_resource_orm(models2.Job, values["id"])
-
-    for sci in p_schedule_components_ids:
-        c = base.get_resource_orm(models2.Component, sci)
-        try:
-            j.components.append(c)
-            flask.g.session.add(j)
-            flask.g.session.commit()
-        except sa_exc.IntegrityError as e:
-            logger.error(str(e))
-            flask.g.session.rollback()
-            raise dci_exc.DCIException(
-                message="conflict when adding component %s" % c.name, status_code=409
-            )
+    _create_job(values, p_schedule_components_ids)
 
     return values
 
 
+def _verify_components_exist(components_ids):
+    """Check in one query that the components exist and are not archived,
+    raise a 404 otherwise."""
+    if not components_ids:
+        return
+    query = flask.g.session.query(models2.Component.id).filter(
+        models2.Component.id.in_(components_ids),
+        models2.Component.state != "archived",
+    )
+    existing_ids = set(str(c.id) for c in query.all())
+    if any(str(c_id) not in existing_ids for c_id in components_ids):
+        raise dci_exc.DCIException(message="component not found", status_code=404)
+
+
+def _create_job(values, components_ids):
+    """Insert the job and its jobs_components rows in one transaction, the
+    components are added with a single multi-row insert."""
+    session = flask.g.session
+    try:
+        session.add(models2.Job(**values))
+        session.flush()
+    except sa_exc.IntegrityError:
+        session.rollback()
+        raise dci_exc.DCIException(
+            message="We are unable to create this resource. A similar resource already exists.",
+            status_code=409,
+        )
+    except Exception:
+        session.rollback()
+        raise dci_exc.DCIException(
+            message="We are unable to create this resource. Please contact a DCI administrator."
+        )
+
+    try:
+        if components_ids:
+            session.execute(
+                models2.JOIN_JOBS_COMPONENTS.insert().values(
+                    [
+                        {"job_id": values["id"], "component_id": c_id}
+                        for c_id in components_ids
+                    ]
+                )
+            )
+        session.commit()
+    except sa_exc.IntegrityError as e:
+        logger.error(str(e))
+        session.rollback()
+        raise dci_exc.DCIException(
+            message="conflict when adding components %s"
+            % ", ".join(str(c_id) for c_id in components_ids),
+            status_code=409,
+        )
+
+
 @api.route("/jobs/<uuid:job_id>/update", methods=["POST"])
 @decorators.login_required
+@decorators.admission_controlled(schedule_admission)
 def create_new_update_job_from_an_existing_job(user, job_id):
     """Create a new job in the same topic as the job_id provided and
     associate the latest components of this topic."""
@@ -264,6 +293,7 @@ def create_new_update_job_from_an_existing_job(user, job_id):
 
 @api.route("/jobs/upgrade", methods=["POST"])
 @decorators.login_required
+@decorators.admission_controlled(schedule_admission)
 def create_new_upgrade_job_from_an_existing_job(user):
     """Create a new job in the 'next topic' of the topic of
     the provided job_id."""
@@ -320,6 +350,17 @@ def create_new_upgrade_job_from_an_existing_job(user):
     )
 
 
+JOBS_EMBEDS = {
+    "results": sa_orm.selectinload("results"),
+    "remoteci": sa_orm.joinedload("remoteci", innerjoin=True),
+    "components": sa_orm.selectinload("components"),
+    "topic": sa_orm.joinedload("topic", innerjoin=True),
+    "team": sa_orm.joinedload("team", innerjoin=True),
+    "pipeline": sa_orm.joinedload("pipeline", innerjoin=False),
+    "keys_values": sa_orm.selectinload("keys_values"),
+}
+
+
 @api.route("/jobs", methods=["GET"])
 @decorators.login_required
 def get_all_jobs(user, topic_id=None):
@@ -347,23 +388,23 @@ def get_all_jobs(user, topic_id=None):
     query = declarative.handle_args(query, models2.Job, args)
 
     # Load associated ressources
-    query = (
-        query.options(sa_orm.selectinload("results"))
-        .options(sa_orm.joinedload("remoteci", innerjoin=True))
-        .options(sa_orm.selectinload("components"))
-        .options(sa_orm.joinedload("topic", innerjoin=True))
-        .options(sa_orm.joinedload("team", innerjoin=True))
-        .options(sa_orm.joinedload("pipeline", innerjoin=False))
-        .options(sa_orm.joinedload("keys_values", innerjoin=False))
+    query = declarative.handle_embed(query, args, JOBS_EMBEDS)
+    query = declarative.handle_fields(query, models2.Job, args)
+
+    nb_jobs = declarative.get_count(query, args)
+    query = declarative.handle_pagination(query, args, models2.Job)
+    # keys_values is selectin loaded: yield_per is not compatible with the
+    # joined eager loading of collections
+    query = query.yield_per(base.STREAM_YIELD_PER)
+
+    return base.stream_resources(
+        "jobs",
+        query,
+        lambda j: j.serialize(ignore_columns=["data"]),
+        meta={"count": nb_jobs},
+        next_cursor=declarative.get_cursor_builder(models2.Job, args),
     )
 
-    nb_jobs = query.count()
-    query = declarative.handle_pagination(query, args)
-
-    jobs = [j.serialize(ignore_columns=["data"]) for j in query.all()]
-
-    return flask.jsonify({"jobs": jobs, "_meta": {"count": nb_jobs}})
-
 
 @api.route("/jobs/<uuid:job_id>/components", methods=["GET"])
 @decorators.login_required
@@ -399,14 +440,10 @@ def add_component_to_job(user, job_id):
     j = base.get_resource_orm(models2.Job, job_id)
     component = base.get_resource_orm(models2.Component, values["id"])
 
-    components_access_teams_ids = permissions.get_components_access_teams_ids(
-        user.teams_ids
-    )
-
     if (
-        component.team_id
-        and user.is_not_in_team(component.team_id)
-        and component.team_id not in components_access_teams_ids
+        user.is_not_super_admin()
+        and user.is_not_epm()
+        and permissions.get_unauthorized_components_ids(user.teams_ids, [component.id])
     ):
         raise dci_exc.Unauthorized()
 
@@ -460,6 +497,127 @@ def get_jobstates_by_job(user, job_id):
     return jobstates.get_all_jobstates(user, job_id)
 
 
+def _json_list(model_object, whereclause, order_by):
+    json_list = func.json_agg(
+        aggregate_order_by(declarative.get_json_object(model_object), *order_by)
+    )
+    return (
+        sql.select([func.coalesce(json_list, sql.text("'[]'::json"))])
+        .where(whereclause)
+        .as_scalar()
+    )
+
+
+def _json_object(model_object, whereclause):
+    return (
+        sql.select([declarative.get_json_object(model_object)])
+        .where(whereclause)
+        .as_scalar()
+    )
+
+
+def get_job_document(query):
+    """Build the GET /jobs/<id> document of the job selected by query in a
+    single Postgres query. Return its etag and the document as JSON text,
+    or None if there is no such job."""
+    Job = models2.Job
+    Component = models2.Component
+    _JJC = models2.JOIN_JOBS_COMPONENTS
+    document = declarative.get_json_object(
+        Job,
+        [
+            (
+                "results",
+                _json_list(
+                    models2.TestsResult,
+                    models2.TestsResult.job_id == Job.id,
+                    [models2.TestsResult.created_at, models2.TestsResult.id],
+                ),
+            ),
+            (
+                "remoteci",
+                _json_object(models2.Remoteci, models2.Remoteci.id == Job.remoteci_id),
+            ),
+            (
+                "components",
+                _json_list(
+                    Component,
+                    sql.and_(
+                        _JJC.c.job_id == Job.id, _JJC.c.component_id == Component.id
+                    ),
+                    [Component.created_at, Component.id],
+                ),
+            ),
+            ("topic", _json_object(models2.Topic, models2.Topic.id == Job.topic_id)),
+            ("team", _json_object(models2.Team, models2.Team.id == Job.team_id)),
+            (
+                "jobstates",
+                _json_list(
+                    models2.Jobstate,
+                    models2.Jobstate.job_id == Job.id,
+                    [models2.Jobstate.created_at, models2.Jobstate.id],
+                ),
+            ),
+            (
+                "pipeline",
+                _json_object(models2.Pipeline, models2.Pipeline.id == Job.pipeline_id),
+            ),
+            (
+                "keys_values",
+                _json_list(
+                    models2.JobKeyValue,
+                    models2.JobKeyValue.job_id == Job.id,
+                    [models2.JobKeyValue.key],
+                ),
+            ),
+            (
+                "files",
+                _json_list(
+                    models2.File,
+                    sql.and_(
+                        models2.File.job_id == Job.id,
+                        models2.File.jobstate_id == None,  # noqa
+                        models2.File.state != "archived",
+                    ),
+                    [models2.File.created_at, models2.File.id],
+                ),
+            ),
+        ],
+    )
+    # the ORM path inner joins the topic
+    query = query.filter(Job.topic_id != None)  # noqa
+    return query.with_entities(Job.etag, sql.cast(document, Text)).first()
+
+
+def get_job_validator_query(query):
+    """Return the query selecting the etag of the job selected by query and
+    the versions of the resources of its GET /jobs/<id> document. Its
+    files, results and keys/values already change the job etag."""
+    Job = models2.Job
+    _JJC = models2.JOIN_JOBS_COMPONENTS
+    return query.with_entities(
+        Job.etag,
+        Job.updated_at,
+        base.get_embeds_version(
+            models2.Remoteci, models2.Remoteci.id == Job.remoteci_id
+        ),
+        base.get_embeds_version(models2.Topic, models2.Topic.id == Job.topic_id),
+        base.get_embeds_version(models2.Team, models2.Team.id == Job.team_id),
+        base.get_embeds_version(
+            models2.Pipeline, models2.Pipeline.id == Job.pipeline_id
+        ),
+        base.get_embeds_version(
+            models2.Component,
+            sql.and_(
+                _JJC.c.job_id == Job.id, _JJC.c.component_id == models2.Component.id
+            ),
+        ),
+        base.get_embeds_version(
+            models2.Jobstate, models2.Jobstate.job_id == Job.id, "created_at"
+        ),
+    )
+
+
 @api.route("/jobs/<uuid:job_id>", methods=["GET"])
 @decorators.login_required
 def get_job_by_id(user, job_id):
@@ -472,6 +630,23 @@ def get_job_by_id(user, job_id):
 
     # Get only non archived job
     query = query.filter(models2.Job.state != "archived")
+    validator = base.get_validator(get_job_validator_query(query))
+    not_modified = base.get_not_modified_response(validator)
+    if not_modified is not None:
+        return not_modified
+
+    if flask.current_app.config["JOB_DETAIL_BUILDER"] == "postgresql":
+        job_document = get_job_document(query)
+        if job_document is None:
+            raise dci_exc.DCIException(message="job not found", status_code=404)
+        _, job = job_document
+        return flask.Response(
+            '{"job": %s}' % job,
+            200,
+            headers=base.get_validator_headers(validator),
+            content_type="application/json",
+        )
+
     query = (
         query.options(sa_orm.joinedload("remoteci", innerjoin=True))
         .options(sa_orm.joinedload("topic", innerjoin=True))
@@ -505,7 +680,7 @@ def get_job_by_id(user, job_id):
     return flask.Response(
         json.dumps({"job": job}),
         200,
-        headers={"ETag": job["etag"]},
+        headers=base.get_validator_headers(validator),
         content_type="application/json",
     )
 
@@ -49,13 +49,20 @@ def get_jobs_events_from_sequence(user, sequence):
     )
 
     query = declarative.handle_args(query, models2.JobEvent, args)
-    nb_jobs_events = query.count()
+    nb_jobs_events = declarative.get_count(query, args)
 
-    query = declarative.handle_pagination(query, args)
-    jobs_events = [je.serialize() for je in query.all()]
+    query = declarative.handle_pagination(query, args, models2.JobEvent)
+    jobs_events = query.all()
+
+    _meta = {"count": nb_jobs_events}
+    next_cursor = declarative.get_cursor_builder(models2.JobEvent, args)
+    if next_cursor:
+        _meta["next"] = next_cursor(
+            jobs_events[-1] if jobs_events else None, len(jobs_events)
+        )
 
     return json.jsonify(
-        {"jobs_events": jobs_events, "_meta": {"count": nb_jobs_events}}
+        {"jobs_events": [je.serialize() for je in jobs_events], "_meta": _meta}
     )
 
 
@@ -19,6 +19,8 @@ from dci.common.time import get_job_duration
 
 import flask
 from flask import json
+import logging
+from sqlalchemy import exc as sa_exc
 
 from dci.analytics import access_data_layer as a_d_l
 from dci.api.v1 import api
@@ -33,6 +35,8 @@ from dci.db import models2
 from dci.db import declarative
 import sqlalchemy.orm as sa_orm
 
+logger = logging.getLogger(__name__)
+
 
 def insert_jobstate(values):
     job_state = models2.Jobstate(
@@ -59,6 +63,12 @@ def serialize_job(job_id):
     return job.serialize()
 
 
+def notify_job_finished(job_serialized):
+    notifications.job_dispatcher(job_serialized)
+    job = a_d_l.get_job_by_id(flask.g.session, job_serialized["id"])
+    notifications.publish({"event": "job_finished", "job": job})
+
+
 @api.route("/jobstates", methods=["POST"])
 @decorators.login_required
 def create_jobstates(user):
@@ -77,7 +87,11 @@ def create_jobstates(user):
         if job.status in ["new", "pre-run"]:
             values["status"] = "error"
 
-    created_js = base.create_resource_orm(models2.Jobstate, values)
+    # the jobstate, the job status and the outbox events are committed
+    # together
+    jobstate = models2.Jobstate(**values)
+    created_js = jobstate.serialize()
+    flask.g.session.add(jobstate)
 
     is_job_final_state = job.status in models2.FINAL_STATUSES
 
@@ -85,21 +99,41 @@ def create_jobstates(user):
     job.status = status
     job.duration = get_job_duration(job)
 
+    is_job_finished = status in models2.FINAL_STATUSES and not is_job_final_state
+    use_outbox = flask.current_app.config["JOBSTATE_SIDE_EFFECTS"] == "outbox"
+    if is_job_finished and use_outbox:
+        flask.g.session.add(
+            models2.JobEvent(
+                job_id=job_id, status=values["status"], topic_id=job.topic_id
+            )
+        )
+        flask.g.session.add(
+            models2.OutboxEvent(event="job_finished", data={"job_id": str(job_id)})
+        )
+
     try:
         flask.g.session.commit()
-    except Exception as e:
+    except sa_exc.IntegrityError as e:
+        logger.error(str(e))
         flask.g.session.rollback()
-        raise dci_exc.DCIException(message=str(e), status_code=409)
+        raise dci_exc.DCIException(
+            message="We are unable to create this resource. A similar resource already exists.",
+            status_code=409,
+        )
+    except Exception:
+        logger.exception("unable to create the jobstate of the job %s" % job_id)
+        flask.g.session.rollback()
+        raise dci_exc.DCIException(
+            message="We are unable to create this resource. Please contact a DCI administrator."
+        )
 
     # send notification in case of final jobstate status
-    if status in models2.FINAL_STATUSES and not is_job_final_state:
+    if is_job_finished and not use_outbox:
         job_serialized = serialize_job(job_id)
         jobs_events.create_event(
             job_serialized["id"], values["status"], job_serialized["topic_id"]
         )
-        notifications.job_dispatcher(job_serialized)
-        job = a_d_l.get_job_by_id(flask.g.session, job_id)
-        notifications.publish({"event": "job_finished", "job": job})
+        notify_job_finished(job_serialized)
 
     result = json.dumps({"jobstate": created_js})
     return flask.Response(result, 201, content_type="application/json")
@@ -118,7 +152,7 @@ def get_all_jobstates(user, job_id):
         sa_orm.selectinload("files")
     )
     query = declarative.handle_args(query, models2.Jobstate, args)
-    nb_jobstates = query.count()
+    nb_jobstates = declarative.get_count(query, args)
     query = declarative.handle_pagination(query, args)
 
     jobstates = [js.serialize() for js in query.all()]
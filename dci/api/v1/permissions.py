@@ -90,16 +90,33 @@ def get_components_access_teams_ids(teams_ids):
     """A team can allow another team to see its components.
     This method returns the list of teams ids that allowed teams_ids to see theirs components.
     """
-    components_access_teams_ids = []
+    if not teams_ids:
+        return []
     JTCA = models2.JOIN_TEAMS_COMPONENTS_ACCESS
-    for team_id in teams_ids:
-        query = flask.g.session.query(JTCA)
-        query = query.filter(JTCA.c.team_id == team_id)
-        teams_components_access = query.all()
-        if teams_components_access:
-            for tca in teams_components_access:
-                components_access_teams_ids.append(tca.access_team_id)
-    return components_access_teams_ids
+    query = flask.g.session.query(JTCA.c.access_team_id)
+    query = query.filter(JTCA.c.team_id.in_(teams_ids))
+    return [tca.access_team_id for tca in query.all()]
+
+
+def get_unauthorized_components_ids(teams_ids, components_ids):
+    """Return the ids of the components that teams_ids can't access: the
+    components of another team which didn't grant them access. It is
+    resolved in one query whatever the number of teams and components."""
+    if not components_ids:
+        return []
+    JTCA = models2.JOIN_TEAMS_COMPONENTS_ACCESS
+    access_teams_ids = sql.select([JTCA.c.access_team_id]).where(
+        JTCA.c.team_id.in_(teams_ids)
+    )
+    filters = [
+        models2.Component.id.in_(components_ids),
+        models2.Component.team_id != None,  # noqa
+        ~models2.Component.team_id.in_(access_teams_ids),
+    ]
+    if teams_ids:
+        filters.append(~models2.Component.team_id.in_(teams_ids))
+    query = flask.g.session.query(models2.Component.id).filter(*filters)
+    return [c.id for c in query.all()]
 
 
 def verify_access_to_component(user, component):
@@ -83,9 +83,12 @@ def get_pipelines(user):
     query = query.filter(models2.Pipeline.state != "archived")
     query = query.from_self()
     query = declarative.handle_args(query, models2.Pipeline, args)
-    query = query.options(sa_orm.joinedload("team", innerjoin=True))
+    query = declarative.handle_embed(
+        query, args, {"team": sa_orm.joinedload("team", innerjoin=True)}
+    )
+    query = declarative.handle_fields(query, models2.Pipeline, args)
 
-    nb_pipelines = query.count()
+    nb_pipelines = declarative.get_count(query, args)
     query = declarative.handle_pagination(query, args)
 
     pipelines = [j.serialize(ignore_columns=["data"]) for j in query.all()]
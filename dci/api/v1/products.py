@@ -111,7 +111,7 @@ def get_all_products(user):
             ),
         )
     q = q.distinct()
-    nb_products = q.count()
+    nb_products = d.get_count(q, args)
     q = d.handle_pagination(q, args)
     products = q.all()
     products = list(map(lambda p: p.serialize(), products))
@@ -122,34 +122,44 @@ def get_all_products(user):
 @api.route("/products/<uuid:product_id>", methods=["GET"])
 @decorators.login_required
 def get_product_by_id(user, product_id):
-    try:
-        q = (
-            flask.g.session.query(models2.Product)
-            .filter(models2.Product.state != "archived")
-            .filter(models2.Product.id == product_id)
-            .options(sa_orm.selectinload("topics"))
+    Product = models2.Product
+    q = (
+        flask.g.session.query(Product)
+        .filter(Product.state != "archived")
+        .filter(Product.id == product_id)
+    )
+    if user.is_not_super_admin() and user.is_not_read_only_user() and user.is_not_epm():
+        _JPT = models2.JOIN_PRODUCTS_TEAMS
+        q = q.join(
+            _JPT,
+            sql.and_(
+                _JPT.c.product_id == Product.id,
+                _JPT.c.team_id.in_(user.teams_ids),
+            ),
         )
-        if (
-            user.is_not_super_admin()
-            and user.is_not_read_only_user()
-            and user.is_not_epm()
-        ):
-            _JPT = models2.JOIN_PRODUCTS_TEAMS
-            q = q.join(
-                _JPT,
-                sql.and_(
-                    _JPT.c.product_id == models2.Product.id,
-                    _JPT.c.team_id.in_(user.teams_ids),
-                ),
-            )
-        p = q.one()
+
+    validator = base.get_validator(
+        q.with_entities(
+            Product.etag,
+            Product.updated_at,
+            base.get_embeds_version(
+                models2.Topic, models2.Topic.product_id == Product.id
+            ),
+        )
+    )
+    not_modified = base.get_not_modified_response(validator)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        p = q.options(sa_orm.selectinload("topics")).one()
     except sa_orm.exc.NoResultFound:
         raise dci_exc.DCIException(message="product not found", status_code=404)
 
     return flask.Response(
         json.dumps({"product": p.serialize()}),
         200,
-        headers={"ETag": p.etag},
+        headers=base.get_validator_headers(validator),
         content_type="application/json",
     )
 
@@ -16,11 +16,13 @@
 import flask
 from flask import json
 from sqlalchemy import exc as sa_exc
+from sqlalchemy import sql
 import sqlalchemy.orm as sa_orm
 
 from dci.api.v1 import api
 from dci.api.v1 import base
 from dci.api.v1 import utils as v1_utils
+from dci import auth_mechanism
 from dci import decorators
 from dci.common import exceptions as dci_exc
 from dci.common.schemas import (
@@ -77,14 +79,19 @@ def get_all_remotecis(user, t_id=None):
     if t_id is not None:
         q = q.filter(models2.Remoteci.team_id == t_id)
 
-    q = (
-        q.filter(models2.Remoteci.state != "archived")
-        .options(sa_orm.joinedload("team", innerjoin=True))
-        .options(sa_orm.selectinload("users"))
+    q = q.filter(models2.Remoteci.state != "archived")
+    q = d.handle_embed(
+        q,
+        args,
+        {
+            "team": sa_orm.joinedload("team", innerjoin=True),
+            "users": sa_orm.selectinload("users"),
+        },
     )
+    q = d.handle_fields(q, models2.Remoteci, args)
 
     q = d.handle_args(q, models2.Remoteci, args)
-    nb_remotecis = q.count()
+    nb_remotecis = d.get_count(q, args)
 
     q = d.handle_pagination(q, args)
     remotecis = q.all()
@@ -93,9 +100,35 @@ def get_all_remotecis(user, t_id=None):
     return flask.jsonify({"remotecis": remotecis, "_meta": {"count": nb_remotecis}})
 
 
+def _verify_access_to_remoteci(user, remoteci):
+    if user.is_not_in_team(remoteci.team_id) and user.is_not_read_only_user():
+        raise dci_exc.Unauthorized()
+
+
 @api.route("/remotecis/<uuid:remoteci_id>", methods=["GET"])
 @decorators.login_required
 def get_remoteci_by_id(user, remoteci_id):
+    Remoteci = models2.Remoteci
+    _URC = models2.USER_REMOTECIS
+    validator = base.get_validator(
+        flask.g.session.query(
+            Remoteci.etag,
+            Remoteci.updated_at,
+            base.get_embeds_version(models2.Team, models2.Team.id == Remoteci.team_id),
+            base.get_embeds_version(
+                models2.User,
+                sql.and_(
+                    _URC.c.remoteci_id == Remoteci.id, _URC.c.user_id == models2.User.id
+                ),
+            ),
+            Remoteci.team_id,
+        ).filter(Remoteci.id == remoteci_id, Remoteci.state != "archived"),
+        lambda r: _verify_access_to_remoteci(user, r),
+    )
+    not_modified = base.get_not_modified_response(validator)
+    if not_modified is not None:
+        return not_modified
+
     r = base.get_resource_orm(
         models2.Remoteci,
         remoteci_id,
@@ -104,13 +137,12 @@ def get_remoteci_by_id(user, remoteci_id):
             sa_orm.selectinload("users"),
         ],
     )
-    if user.is_not_in_team(r.team_id) and user.is_not_read_only_user():
-        raise dci_exc.Unauthorized()
+    _verify_access_to_remoteci(user, r)
 
     return flask.Response(
         json.dumps({"remoteci": r.serialize()}),
         200,
-        headers={"ETag": r.etag},
+        headers=base.get_validator_headers(validator),
         content_type="application/json",
     )
 
@@ -128,6 +160,7 @@ def put_remoteci(user, remoteci_id):
         raise dci_exc.Unauthorized()
 
     base.update_resource_orm(remoteci, values)
+    auth_mechanism.invalidate_hmac_identity("remoteci", remoteci_id)
 
     remoteci = base.get_resource_orm(models2.Remoteci, remoteci_id)
 
@@ -151,6 +184,7 @@ def delete_remoteci_by_id(user, remoteci_id):
         raise dci_exc.Unauthorized()
 
     base.update_resource_orm(remoteci, {"state": "archived", "users": []})
+    auth_mechanism.invalidate_hmac_identity("remoteci", remoteci_id)
 
     try:
         flask.g.session.query(models2.Job).filter(
@@ -265,6 +299,7 @@ def put_api_secret_remoteci(user, remoteci_id):
         raise dci_exc.Unauthorized()
 
     base.update_resource_orm(remoteci, {"api_secret": signature.gen_secret()})
+    auth_mechanism.invalidate_hmac_identity("remoteci", remoteci_id)
 
     remoteci = base.get_resource_orm(models2.Remoteci, remoteci_id)
     return flask.Response(
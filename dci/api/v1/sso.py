@@ -15,21 +15,28 @@
 # under the License.
 
 import jwt
+import logging
+import os
 import requests
+import threading
+import time
 
 from dci import dci_config
 from dci.common import exceptions as dci_exc
 from dci import auth
 
+logger = logging.getLogger(__name__)
 
-def get_public_key_from_token(token):
-    header = jwt.get_unverified_header(token)
-    kid = header["kid"]
+
+def get_jwks():
+    """Fetch the SSO JSON Web Key Set and return the public keys in PEM
+    format indexed by kid."""
     sso_url = dci_config.CONFIG.get("SSO_URL")
     realm = dci_config.CONFIG.get("SSO_REALM")
+    timeout = dci_config.CONFIG["REQUESTS_TIMEOUT"]
 
     url = "%s/auth/realms/%s/.well-known/openid-configuration" % (sso_url, realm)
-    openid_configuration = requests.get(url)
+    openid_configuration = requests.get(url, timeout=timeout)
     if openid_configuration.status_code != 200:
         raise Exception(
             "unable to get sso openid-configuration from url '%s', status=%s, error=%s"
@@ -39,7 +46,7 @@ def get_public_key_from_token(token):
         raise dci_exc.DCIException("jwks_uri key not in the sso openid-configuration")
 
     jwks_uri = openid_configuration.json()["jwks_uri"]
-    keys = requests.get(jwks_uri)
+    keys = requests.get(jwks_uri, timeout=timeout)
     if keys.status_code != 200:
         raise dci_exc.DCIException(
             "unable to get jwks content from url '%s', status=%s, error=%s"
@@ -48,8 +55,111 @@ def get_public_key_from_token(token):
     if "keys" not in keys.json():
         raise dci_exc.DCIException("no 'keys' key found in jwks content")
 
-    keys = keys.json()["keys"]
-    for k in keys:
-        if k["kid"] == kid:
-            return auth.jwk_to_pem(k)
-    raise dci_exc.DCIException("kid '%s' from token not found in sso server" % kid)
+    return {k["kid"]: auth.jwk_to_pem(k) for k in keys.json()["keys"] if "kid" in k}
+
+
+def get_kid_from_token(token):
+    try:
+        return jwt.get_unverified_header(token).get("kid")
+    except jwt.exceptions.DecodeError:
+        return None
+
+
+class JWKSCache(object):
+    """SSO public keys indexed by kid.
+
+    The key set is only fetched by a background thread, started with the
+    app: once at start, then periodically, and when a request brings a
+    token signed by an unknown key, at most every
+    SSO_JWKS_MIN_REFRESH_INTERVAL seconds. Such a request waits for that
+    fetch, at most timeout seconds, instead of doing it itself.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._last_refresh = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # the refreshes requested and done, for the requests waiting a key
+        self._refreshed = threading.Condition()
+        self._nb_requested = 0
+        self._nb_done = 0
+        # the thread does not survive a fork, the workers start their own
+        self._pid = None
+
+    def get_public_key(self, kid):
+        if kid is None:
+            return None
+        return self._keys.get(kid)
+
+    def request_refresh(self):
+        """Wake the background thread up to fetch the key set. Return the
+        number the refresh answering this request will reach."""
+        with self._refreshed:
+            self._nb_requested += 1
+            nb_requested = self._nb_requested
+        self._wakeup.set()
+        return nb_requested
+
+    def wait_for_key(self, kid, timeout):
+        """Request a refresh and wait for it, at most timeout seconds.
+        Return the key of kid, or None if it is still unknown."""
+        nb_requested = self.request_refresh()
+        deadline = time.monotonic() + timeout
+        with self._refreshed:
+            while kid not in self._keys and self._nb_done < nb_requested:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._refreshed.wait(remaining)
+        return self.get_public_key(kid)
+
+    def refresh(self, force=False):
+        min_interval = dci_config.CONFIG["SSO_JWKS_MIN_REFRESH_INTERVAL"]
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._last_refresh is not None
+                and now - self._last_refresh < min_interval
+            ):
+                return False
+            self._last_refresh = now
+            try:
+                keys = get_jwks()
+            except Exception as e:
+                logger.warning("unable to refresh the sso public keys: %s" % str(e))
+                return False
+            if set(keys) != set(self._keys):
+                logger.info("sso public keys updated, kids: %s" % sorted(keys))
+            self._keys = keys
+            return True
+
+    def start_refresher(self):
+        """Start the background refresh once per process."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        interval = dci_config.CONFIG["SSO_JWKS_REFRESH_INTERVAL"]
+        refresher = threading.Thread(
+            target=self._refresh_forever, args=(interval,), name="sso-jwks-refresher"
+        )
+        refresher.daemon = True
+        refresher.start()
+
+    def _refresh_forever(self, interval):
+        # with an interval of 0 the key set is only fetched at start and
+        # on request
+        requested = False
+        while True:
+            self._wakeup.clear()
+            with self._refreshed:
+                nb_requested = self._nb_requested
+            self.refresh(force=not requested)
+            with self._refreshed:
+                self._nb_done = nb_requested
+                self._refreshed.notify_all()
+            requested = self._wakeup.wait(interval if interval > 0 else None)
+
+
+jwks_cache = JWKSCache()
@@ -22,6 +22,7 @@ from dci.api.v1 import api
 from dci.api.v1 import base
 from dci.api.v1 import remotecis
 from dci.api.v1 import utils as v1_utils
+from dci import auth_mechanism
 from dci import decorators
 from dci.common import exceptions as dci_exc
 from dci.common.schemas import (
@@ -81,7 +82,7 @@ def get_all_teams(user):
         sa_orm.selectinload("remotecis")
     )
     q = d.handle_args(q, models2.Team, args)
-    nb_teams = q.count()
+    nb_teams = d.get_count(q, args)
 
     q = d.handle_pagination(q, args)
     teams = q.all()
@@ -165,6 +166,8 @@ def put_team(user, t_id):
         .update(values)
     )
     flask.g.session.commit()
+    auth_mechanism.invalidate_hmac_identities()
+    auth_mechanism.invalidate_users_identities()
 
     if not updated_team:
         flask.g.session.rollback()
@@ -219,6 +222,8 @@ def delete_team_by_id(user, t_id):
                 {"state": "archived"}
             )
         flask.g.session.commit()
+        auth_mechanism.invalidate_hmac_identities()
+        auth_mechanism.invalidate_users_identities()
     except Exception as e:
         flask.g.session.rollback()
         raise dci_exc.DCIException(message=str(e), status_code=409)
@@ -17,6 +17,7 @@ from sqlalchemy import exc as sa_exc
 
 from dci.api.v1 import api
 from dci.api.v1 import base
+from dci import auth_mechanism
 from dci import decorators
 from dci.common import exceptions as dci_exc
 from dci.db import models2
@@ -42,6 +43,7 @@ def add_user_to_team(user, team_id, user_id):
         team.users.append(user)
         flask.g.session.add(team)
         flask.g.session.commit()
+        auth_mechanism.invalidate_user_identity(user_id)
     except sa_exc.IntegrityError:
         flask.g.session.rollback()
         raise dci_exc.DCIException(message="conflict when adding team", status_code=409)
@@ -85,6 +87,7 @@ def remove_user_from_team(user, team_id, user_id):
         team.users.remove(user)
         flask.g.session.add(team)
         flask.g.session.commit()
+        auth_mechanism.invalidate_user_identity(user_id)
     except sa_exc.IntegrityError:
         flask.g.session.rollback()
         raise dci_exc.DCIException(
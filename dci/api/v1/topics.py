@@ -62,6 +62,25 @@ def create_topics(user):
 @api.route("/topics/<uuid:topic_id>", methods=["GET"])
 @decorators.login_required
 def get_topic_by_id(user, topic_id):
+    Topic = models2.Topic
+    NextTopic = sa_orm.aliased(Topic)
+    validator = base.get_validator(
+        flask.g.session.query(
+            Topic.etag,
+            Topic.updated_at,
+            base.get_embeds_version(
+                models2.Product, models2.Product.id == Topic.product_id
+            ),
+            base.get_embeds_version(NextTopic, NextTopic.id == Topic.next_topic_id),
+            Topic.product_id,
+            Topic.export_control,
+        ).filter(Topic.id == topic_id, Topic.state != "archived"),
+        lambda t: permissions.verify_access_to_topic(user, t),
+    )
+    not_modified = base.get_not_modified_response(validator)
+    if not_modified is not None:
+        return not_modified
+
     topic = base.get_resource_orm(
         models2.Topic,
         topic_id,
@@ -83,7 +102,7 @@ def get_topic_by_id(user, topic_id):
     return flask.Response(
         json.dumps({"topic": topic_serialized}),
         200,
-        headers={"ETag": topic.etag},
+        headers=base.get_validator_headers(validator),
         content_type="application/json",
     )
 
@@ -106,7 +125,7 @@ def get_all_topics(user):
             q = q.filter(models2.Topic.export_control == True)  # noqa
 
     q = d.handle_args(q, models2.Topic, args)
-    nb_topics = q.count()
+    nb_topics = d.get_count(q, args)
     q = d.handle_pagination(q, args)
 
     topics = q.all()
@@ -154,6 +173,7 @@ def delete_topic_by_id(user, topic_id):
             models2.Component.topic_id == topic_id
         ).update({"state": "archived"}, synchronize_session=False)
         flask.g.session.commit()
+        components.invalidate_latest_components(topic_id)
     except Exception as e:
         flask.g.session.rollback()
         raise dci_exc.DCIException(message=str(e), status_code=409)
@@ -16,12 +16,14 @@
 import flask
 from flask import json
 from sqlalchemy import exc as sa_exc
+from sqlalchemy import sql
 import sqlalchemy.orm as sa_orm
 
 from dci.api.v1 import api
 from dci.api.v1 import base
 from dci.api.v1 import utils as v1_utils
 from dci import auth
+from dci import auth_mechanism
 from dci import decorators
 from dci.common import exceptions as dci_exc
 from dci.common import utils
@@ -89,29 +91,56 @@ def get_all_users(user):
     if user.is_not_super_admin() and user.is_not_epm():
         raise dci_exc.Unauthorized()
 
-    q = (
-        flask.g.session.query(models2.User)
-        .filter(models2.User.state != "archived")
-        .options(sa_orm.selectinload("team"))
-        .options(sa_orm.selectinload("remotecis"))
+    q = flask.g.session.query(models2.User).filter(models2.User.state != "archived")
+    q = d.handle_embed(
+        q,
+        args,
+        {
+            "team": sa_orm.selectinload("team"),
+            "remotecis": sa_orm.selectinload("remotecis"),
+        },
     )
+    q = d.handle_fields(q, models2.User, args)
     q = d.handle_args(q, models2.User, args)
-    nb_users = q.count()
-    q = d.handle_pagination(q, args)
-    users = q.all()
-    users = list(
-        map(
-            lambda u: u.serialize(ignore_columns=("password", "remotecis.api_secret")),
-            users,
-        )
+    nb_users = d.get_count(q, args)
+    q = d.handle_pagination(q, args, models2.User)
+    q = q.yield_per(base.STREAM_YIELD_PER)
+
+    return base.stream_resources(
+        "users",
+        q,
+        lambda u: u.serialize(ignore_columns=("password", "remotecis.api_secret")),
+        meta={"count": nb_users},
+        next_cursor=d.get_cursor_builder(models2.User, args),
     )
 
-    return flask.jsonify({"users": users, "_meta": {"count": nb_users}})
-
 
 def user_by_id(user, user_id):
     if user.id != user_id and user.is_not_super_admin() and user.is_not_epm():
         raise dci_exc.Unauthorized()
+    User = models2.User
+    _UT = models2.USERS_TEAMS
+    _URC = models2.USER_REMOTECIS
+    validator = base.get_validator(
+        flask.g.session.query(
+            User.etag,
+            User.updated_at,
+            base.get_embeds_version(
+                models2.Team,
+                sql.and_(_UT.c.user_id == User.id, _UT.c.team_id == models2.Team.id),
+            ),
+            base.get_embeds_version(
+                models2.Remoteci,
+                sql.and_(
+                    _URC.c.user_id == User.id, _URC.c.remoteci_id == models2.Remoteci.id
+                ),
+            ),
+        ).filter(User.id == user_id, User.state != "archived")
+    )
+    not_modified = base.get_not_modified_response(validator)
+    if not_modified is not None:
+        return not_modified
+
     base.get_resource_orm(models2.User, user_id)
 
     u = (
@@ -128,7 +157,7 @@ def user_by_id(user, user_id):
     return flask.Response(
         json.dumps({"user": u.serialize(ignore_columns=("password",))}),
         200,
-        headers={"ETag": u.etag},
+        headers=base.get_validator_headers(validator),
         content_type="application/json",
     )
 
@@ -180,6 +209,7 @@ def put_current_user(user):
         .update(new_values)
     )
     flask.g.session.commit()
+    auth_mechanism.invalidate_user_identity(user.id)
 
     if not updated_user:
         flask.g.session.rollback()
@@ -222,6 +252,7 @@ def put_user(user, user_id):
         .update(values)
     )
     flask.g.session.commit()
+    auth_mechanism.invalidate_user_identity(user_id)
 
     if not updated_user:
         flask.g.session.rollback()
@@ -259,6 +290,7 @@ def delete_user_by_id(user, user_id):
         .update({"state": "archived"})
     )
     flask.g.session.commit()
+    auth_mechanism.invalidate_user_identity(user_id)
 
     if not deleted_user:
         raise dci_exc.DCIException(
@@ -15,20 +15,21 @@
 # under the License.
 from dci.api import v1 as api_v1
 from dci.api import v2 as api_v2
+from dci.api.v1 import sso
 from dci.common import exceptions
+from dci.common import publisher
 from dci.common import utils
 from dci.db import models2
 from dci import dci_config
 
 import flask
-import kombu
 import logging
 import sys
 import time
 import zmq
 
 from sqlalchemy import exc as sa_exc
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 try:
     import psycogreen.gevent
@@ -42,7 +43,38 @@ logger = logging.getLogger(__name__)
 zmq_sender = None
 
 
+def _connect(engine):
+    for i in range(5):
+        try:
+            return engine.connect()
+        except Exception:
+            logging.warning(
+                "failed to connect to the database, " "will retry in 1 second..."
+            )
+            time.sleep(1)
+    return engine.connect()
+
+
+class DciAppCtxGlobals(flask.ctx._AppCtxGlobals):
+    """Lazily check out the database connection and open the ORM session.
+
+    Nothing is taken from the pool until a view actually touches
+    flask.g.db_conn or flask.g.session, and both share the same connection.
+    """
+
+    def __getattr__(self, name):
+        if name == "db_conn":
+            self.db_conn = _connect(flask.current_app.engine)
+            return self.db_conn
+        if name == "session":
+            self.session = Session(bind=self.db_conn)
+            return self.session
+        raise AttributeError(name)
+
+
 class DciControlServer(flask.Flask):
+    app_ctx_globals_class = DciAppCtxGlobals
+
     def __init__(self):
         super(DciControlServer, self).__init__(__name__)
         self.config.update(dci_config.CONFIG)
@@ -50,7 +82,13 @@ class DciControlServer(flask.Flask):
         self.engine = dci_config.get_engine(self.config["SQLALCHEMY_DATABASE_URI"])
         self.sender = self._get_zmq_sender(self.config["ZMQ_CONN"])
         self.store = dci_config.get_store()
-        self.messaging = KombuProducer()
+        self.messaging = publisher.AMQPPublisher(
+            self.config["AMQP_BROKER_URL"],
+            self.config["AMQP_SPOOL_FOLDER"],
+            max_buffered=self.config["AMQP_BUFFER_SIZE"],
+            batch_size=self.config["AMQP_BATCH_SIZE"],
+            flush_interval=self.config["AMQP_FLUSH_INTERVAL"],
+        )
         session = sessionmaker(bind=self.engine)()
         self.team_admin_id = self._get_team_id(session, "admin")
         self.team_redhat_id = self._get_team_id(session, "Red Hat")
@@ -91,32 +129,6 @@ class DciControlServer(flask.Flask):
         return team.id
 
 
-class KombuProducer:
-    def __init__(self):
-        super(KombuProducer, self).__init__()
-        self._connection = kombu.Connection(dci_config.CONFIG["AMQP_BROKER_URL"])
-        self._exchange = kombu.Exchange("dci.analytics.exchange", type="direct")
-        self._queue = kombu.Queue(
-            name="dci.analytics.queue",
-            exchange=self._exchange,
-            routing_key="dci.analytics.jobs",
-        )
-        self._producer = None
-
-    def publish(self, message):
-        if not self._producer:
-            channel = self._connection.channel()
-            self._producer = kombu.Producer(
-                exchange=self._exchange,
-                channel=channel,
-                routing_key="dci.analytics.jobs",
-            )
-            self._queue.maybe_bind(self._connection)
-            self._queue.declare()
-
-        return self._producer.publish(message)
-
-
 def configure_root_logger():
     conf = dci_config.CONFIG
     logging.basicConfig(level=conf.get("LOG_LEVEL", logging.INFO))
@@ -150,6 +162,7 @@ def create_app(param=None):
     def handle_api_exception(api_exception):
         response = flask.jsonify(api_exception.to_dict())
         response.status_code = api_exception.status_code
+        response.headers.extend(getattr(api_exception, "headers", {}))
         logger.exception(api_exception)
         return response
 
@@ -166,33 +179,29 @@ def create_app(param=None):
         flask.g.team_redhat_id = dci_app.team_redhat_id
         flask.g.team_epm_id = dci_app.team_epm_id
         flask.g.messaging = dci_app.messaging
-
-        for i in range(5):
-            try:
-                flask.g.engine = dci_app.engine
-                flask.g.db_conn = dci_app.engine.connect()
-                flask.g.session = sessionmaker(bind=dci_app.engine)()
-                break
-            except Exception:
-                logging.warning(
-                    "failed to connect to the database, " "will retry in 1 second..."
-                )
-                time.sleep(1)
-                pass
+        flask.g.engine = dci_app.engine
+        # an enclosing app context may already hold a session, start fresh
+        flask.g.pop("session", None)
+        flask.g.pop("db_conn", None)
         flask.g.store = dci_app.store
         flask.g.sender = dci_app.sender
 
     @dci_app.teardown_request
     def teardown_request(_):
+        # the session and the connection only exist if they have been used
+        session = flask.g.pop("session", None)
+        db_conn = flask.g.pop("db_conn", None)
         try:
-            flask.g.session.close()
+            if session is not None:
+                session.close()
         except Exception:
             logging.warning(
                 "There's been an arror while calling session.close() in teardown_request."
             )
 
         try:
-            flask.g.db_conn.close()
+            if db_conn is not None:
+                db_conn.close()
         except Exception:
             logging.warning(
                 "There's been an error while calling db_conn.close() in teardown_request."
@@ -206,7 +215,10 @@ def create_app(param=None):
     dci_app.register_blueprint(api_v1.api, url_prefix="/api/v1")
     dci_app.register_blueprint(api_v2.api, url_prefix="/api/v2")
 
+    # the SSO key set is fetched before the first request
+    sso.jwks_cache.start_refresher()
+
     # Registering custom encoder
-    dci_app.json_encoder = utils.JSONEncoder
+    dci_app.json_encoder = utils.get_json_encoder(dci_app.config["JSON_ENCODER"])
 
     return dci_app
@@ -14,7 +14,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
 import flask
+import hashlib
+import hmac
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import time
 import uuid
 from sqlalchemy import exc as sa_exc
 from sqlalchemy import sql
@@ -23,17 +32,63 @@ from sqlalchemy import orm
 from dci.api.v1 import base, sso
 from dci.auth import check_passwords_equal, decode_jwt
 from dci import dci_config
+from dci.common import cache
 from dci.common import exceptions as dci_exc
 from dciauth.v2.headers import parse_headers
 from dciauth.v2.signature import is_valid
 from dci.db import models2
 from dci.identity import Identity
+from dci.stores import files_utils
 
 import logging
 from jwt import exceptions as jwt_exc
 
 logger = logging.getLogger(__name__)
 
+# remotecis and feeders identities, keyed by (client_type, client_id)
+hmac_identity_cache = cache.TTLCache(
+    maxsize=dci_config.CONFIG["HMAC_IDENTITY_CACHE_SIZE"],
+    ttl=dci_config.CONFIG["HMAC_IDENTITY_CACHE_TTL"],
+)
+
+
+# the bodies over this size are written to a temporary file to be signed,
+# the uploads are not held in memory
+HMAC_SPOOLED_BODY_MIN_SIZE = 1024 * 1024
+
+
+def invalidate_hmac_identity(client_type, client_id):
+    hmac_identity_cache.delete((client_type, str(client_id)))
+
+
+def invalidate_hmac_identities():
+    hmac_identity_cache.clear()
+
+
+# successful basic auth verifications, keyed by (user_id, keyed password hash),
+# the value is the password hash the password has been verified against
+basic_auth_cache = cache.TTLCache(
+    maxsize=dci_config.CONFIG["BASIC_AUTH_CACHE_SIZE"],
+    ttl=dci_config.CONFIG["BASIC_AUTH_CACHE_TTL"],
+)
+_basic_auth_cache_key = os.urandom(32)
+
+# SSO users identities, keyed by (token digest, X-Dci-Team-Id header), the
+# entries expire at the latest with the token
+sso_identity_cache = cache.TTLCache(
+    maxsize=dci_config.CONFIG["SSO_IDENTITY_CACHE_SIZE"],
+    ttl=dci_config.CONFIG["SSO_IDENTITY_CACHE_TTL"],
+)
+
+
+def invalidate_user_identity(user_id):
+    user_id = str(user_id)
+    sso_identity_cache.evict(lambda _, identity: identity.id == user_id)
+
+
+def invalidate_users_identities():
+    sso_identity_cache.clear()
+
 
 class BaseMechanism(object):
     def __init__(self, request):
@@ -135,12 +190,31 @@ class BasicAuthMechanism(BaseMechanism):
                 raise dci_exc.DCIException(
                     "User %s does not exists." % username, status_code=401
                 )
-        is_authenticated = check_passwords_equal(auth.password, user.password)
+        is_authenticated = self.check_password(user, auth.password)
         if not is_authenticated:
             raise dci_exc.DCIException("Invalid user credentials", status_code=401)
         self.identity = self.identity_from_user(user)
         return True
 
+    @staticmethod
+    def check_password(user, password):
+        """Verify the password against the user's password hash, a successful
+        verification is cached until the hash changes or the ttl expires."""
+        password_digest = hmac.new(
+            _basic_auth_cache_key, password.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        cache_key = (str(user.id), password_digest)
+        verified_password_hash = basic_auth_cache.get(cache_key)
+        if (
+            verified_password_hash is not None
+            and verified_password_hash == user.password
+        ):
+            return True
+        if not check_passwords_equal(password, user.password):
+            return False
+        basic_auth_cache.set(cache_key, user.password)
+        return True
+
 
 class HmacMechanism(BaseMechanism):
     def authenticate(self):
@@ -152,22 +226,48 @@ class HmacMechanism(BaseMechanism):
         self.identity = self.build_identity(headers)
         if self.identity is None:
             raise dci_exc.DCIException("identity does not exists.", status_code=401)
-        valid, error_message = is_valid(
-            {
-                "method": self.request.method,
-                "endpoint": self.request.path,
-                "data": self.request.data,
-                "params": self.request.args.to_dict(flat=True),
-            },
-            {"secret_key": self.identity.api_secret},
-            headers,
-        )
+        with self._read_body() as data:
+            valid, error_message = is_valid(
+                {
+                    "method": self.request.method,
+                    "endpoint": self.request.path,
+                    "data": data,
+                    "params": self.request.args.to_dict(flat=True),
+                },
+                {"secret_key": self.identity.api_secret},
+                headers,
+            )
         if not valid:
             raise dci_exc.DCIException("HmacMechanism failed: %s" % error_message)
         if len(self.identity.teams_ids) > 0:
             self.check_team_is_active(self.identity.teams_ids[0])
         return True
 
+    @contextlib.contextmanager
+    def _read_body(self):
+        """Yield the body to sign and put it back in the request, the view
+        reads it again from request.stream or request.data. A large body is
+        copied to a temporary file and mapped in memory to be hashed."""
+        content_length = self.request.content_length
+        if content_length is None or content_length < HMAC_SPOOLED_BODY_MIN_SIZE:
+            data = self.request.get_data()
+            body = io.BytesIO(data)
+        else:
+            body = tempfile.TemporaryFile()
+            shutil.copyfileobj(self.request.stream, body, files_utils.CHUNK_SIZE)
+            body.flush()
+            data = mmap.mmap(body.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield data
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+            body.seek(0)
+            self.request.environ["wsgi.input"] = body
+            # request.stream is a cached property, it is built again on the
+            # new input
+            self.request.__dict__.pop("stream", None)
+
     def build_identity(self, client_info):
         allowed_types_model = {
             "remoteci": models2.Remoteci,
@@ -177,11 +277,15 @@ class HmacMechanism(BaseMechanism):
         identity_model = allowed_types_model.get(client_type)
         if identity_model is None:
             return None
-        identity = base.get_resource_orm(
-            identity_model, client_info["client_id"], options=[orm.selectinload("team")]
-        )
-        return Identity(
-            {
+        cache_key = (client_type, str(client_info["client_id"]))
+        identity_info = hmac_identity_cache.get(cache_key)
+        if identity_info is None:
+            identity = base.get_resource_orm(
+                identity_model,
+                client_info["client_id"],
+                options=[orm.selectinload("team")],
+            )
+            identity_info = {
                 "id": str(identity.id),
                 "teams": {
                     identity.team.id: {
@@ -195,7 +299,8 @@ class HmacMechanism(BaseMechanism):
                 "is_feeder": client_type == "feeder",
                 "is_read_only_user": identity.team.id == flask.g.team_redhat_id,
             }
-        )
+            hmac_identity_cache.set(cache_key, identity_info)
+        return Identity(identity_info)
 
 
 class OpenIDCAuth(BaseMechanism):
@@ -205,39 +310,15 @@ class OpenIDCAuth(BaseMechanism):
             return False
         _, token = auth_header
         conf = dci_config.CONFIG
+        decoded_token = self._decode_token(token)
 
-        def __get_and_set_sso_public_key():
-            public_key = sso.get_public_key_from_token(token)
-            if public_key and public_key != conf.get("SSO_PUBLIC_KEY"):
-                logging.info("sso public key has been updated")
-                logging.debug(public_key)
-                conf["SSO_PUBLIC_KEY"] = public_key
-
-        if not conf.get("SSO_PUBLIC_KEY"):
-            __get_and_set_sso_public_key()
-
-        try:
-            decoded_token = decode_jwt(
-                token, conf["SSO_PUBLIC_KEY"], conf["SSO_AUDIENCES"]
-            )
-        except (jwt_exc.DecodeError, TypeError, ValueError) as e:
-            logging.debug(
-                "JWT token decode error: %s, will refresh sso public key and retry decode"
-                % str(e)
-            )
-            try:
-                __get_and_set_sso_public_key()
-                decoded_token = decode_jwt(
-                    token, conf["SSO_PUBLIC_KEY"], conf["SSO_AUDIENCES"]
-                )
-            except (jwt_exc.DecodeError, TypeError, ValueError) as e2:
-                raise dci_exc.DCIException(
-                    "JWT token decode error: %s" % str(e2), status_code=401
-                )
-        except jwt_exc.ExpiredSignatureError:
-            raise dci_exc.DCIException(
-                "JWT token expired, please refresh.", status_code=401
-            )
+        cache_key = (
+            hashlib.sha256(token.encode("utf-8")).hexdigest(),
+            self.request.headers.get("X-Dci-Team-Id"),
+        )
+        self.identity = sso_identity_cache.get(cache_key)
+        if self.identity is not None:
+            return True
 
         team_id = None
         read_only_group = conf["SSO_READ_ONLY_GROUP"]
@@ -249,8 +330,50 @@ class OpenIDCAuth(BaseMechanism):
             self.identity = self._get_or_update_or_create_user(user_info, team_id)
         except sa_exc.IntegrityError:
             raise dci_exc.DCICreationConflict("users", "username")
+
+        ttl = sso_identity_cache.ttl
+        if "exp" in decoded_token:
+            ttl = min(ttl, decoded_token["exp"] - time.time())
+        sso_identity_cache.set(cache_key, self.identity, ttl=ttl)
         return True
 
+    @staticmethod
+    def _decode_token(token):
+        """Decode the token with the key matching its kid, or the configured
+        SSO_PUBLIC_KEY. When the kid is unknown, the request waits for the
+        SSO key set to be refreshed in the background, then retries."""
+        conf = dci_config.CONFIG
+        sso.jwks_cache.start_refresher()
+        kid = sso.get_kid_from_token(token)
+        public_key = sso.jwks_cache.get_public_key(kid)
+        if public_key is None and kid is not None:
+            try:
+                return decode_jwt(
+                    token, conf.get("SSO_PUBLIC_KEY"), conf["SSO_AUDIENCES"]
+                )
+            except (jwt_exc.DecodeError, TypeError, ValueError):
+                # the token may be signed with a key added since the last refresh
+                timeout = sum(conf["REQUESTS_TIMEOUT"])
+                public_key = sso.jwks_cache.wait_for_key(kid, timeout)
+            except jwt_exc.ExpiredSignatureError:
+                pass
+        return OpenIDCAuth._decode_token_with_key(
+            token, public_key or conf.get("SSO_PUBLIC_KEY")
+        )
+
+    @staticmethod
+    def _decode_token_with_key(token, public_key):
+        try:
+            return decode_jwt(token, public_key, dci_config.CONFIG["SSO_AUDIENCES"])
+        except (jwt_exc.DecodeError, TypeError, ValueError) as e:
+            raise dci_exc.DCIException(
+                "JWT token decode error: %s" % str(e), status_code=401
+            )
+        except jwt_exc.ExpiredSignatureError:
+            raise dci_exc.DCIException(
+                "JWT token expired, please refresh.", status_code=401
+            )
+
     @staticmethod
     def _is_read_only_user(token, read_only_group):
         # todo(gvincent): implement the solution with idp and verified email
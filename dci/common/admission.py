@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import contextlib
+import math
+import random
+import threading
+import time
+
+from dci.common import exceptions as dci_exc
+
+
+class AdmissionController(object):
+    """Bound the number of requests of a kind running at the same time in
+    the process.
+
+    The requests over the limit wait in one FIFO queue per key (the team)
+    and a freed slot is handed to the queues in turn, so a team scheduling
+    hundreds of jobs does not starve the others. A request is rejected
+    with a 429 right away when the queues are full, or when it waited
+    more than queue_timeout seconds. A max_concurrency of 0 disables it.
+    """
+
+    def __init__(
+        self, max_concurrency=3, max_queued=50, max_queued_per_key=10, queue_timeout=10
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.max_queued_per_key = max_queued_per_key
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+        self._queues = collections.OrderedDict()
+        # moving average of the time a request holds its slot, in seconds
+        self._service_time = 1.0
+
+    def _retry_after(self):
+        backlog = (self._queued + self._running) * self._service_time
+        retry_after = max(1, int(math.ceil(backlog / self.max_concurrency)))
+        # spread the retries of the clients rejected together
+        return retry_after + random.randint(0, retry_after)
+
+    def _reject(self, message):
+        raise dci_exc.TooManyRequests(message, retry_after=self._retry_after())
+
+    def acquire(self, key):
+        with self._lock:
+            if self._running < self.max_concurrency and not self._queued:
+                self._running += 1
+                return
+            queue = self._queues.get(key)
+            if self._queued >= self.max_queued:
+                self._reject("Too many requests queued, retry later.")
+            if queue is not None and len(queue) >= self.max_queued_per_key:
+                self._reject("Too many requests queued for %s, retry later." % key)
+            if queue is None:
+                queue = self._queues[key] = collections.deque()
+            waiter = threading.Event()
+            queue.append(waiter)
+            self._queued += 1
+
+        if waiter.wait(self.queue_timeout):
+            return
+        with self._lock:
+            # the slot may have been handed over while the timeout expired
+            if waiter.is_set():
+                return
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[key]
+            self._reject("Request not admitted in time, retry later.")
+
+    def release(self, service_time=None):
+        with self._lock:
+            if service_time is not None:
+                self._service_time = 0.8 * self._service_time + 0.2 * service_time
+            if not self._queues:
+                self._running -= 1
+                return
+            # the slot goes to the oldest waiter of the next key in turn
+            key, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._queues[key] = queue
+            self._queued -= 1
+            waiter.set()
+
+    @contextlib.contextmanager
+    def admit(self, key):
+        if self.max_concurrency <= 0:
+            yield
+            return
+        self.acquire(key)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started_at)
@@ -44,9 +44,12 @@ def parse_args(args):
         "sort": _get_csv("sort", args),
         "where": _get_csv("where", args),
         "embed": _get_csv("embed", args),
+        "fields": _get_csv("fields", args),
         "created_after": _get_datetime("created_after", args),
         "updated_after": _get_datetime("updated_after", args),
         "query": _get_str("query", args),
+        "after": _get_str("after", args),
+        "count": _get_str("count", args),
     }
 
     return {k: _res[k] for k in _res if _res[k] is not None}
@@ -80,3 +80,9 @@ class Forbidden(DCIException):
     def __init__(self):
         msg = "Operation forbidden."
         super(Forbidden, self).__init__(msg, status_code=403)
+
+
+class TooManyRequests(DCIException):
+    def __init__(self, message, retry_after):
+        super(TooManyRequests, self).__init__(message, status_code=429)
+        self.headers = {"Retry-After": str(retry_after)}
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import atexit
+import collections
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+import kombu
+
+from dci.common import utils
+
+logger = logging.getLogger(__name__)
+
+# the buffers of the publishers of the process are spooled at exit
+_publishers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_publishers():
+    for amqp in list(_publishers):
+        amqp.close()
+
+
+class AMQPPublisher(object):
+    """Publish messages to the broker from a background thread.
+
+    publish() only appends the message to a bounded buffer, the requests
+    never wait for the broker. The thread sends the buffer in batches over
+    its connection with publisher confirms: basic_publish returns once the
+    broker acknowledged the message.
+
+    When the broker is unreachable, the batch being sent and the buffer
+    are written to the spool folder. When the buffer holds more than
+    max_buffered messages, the thread spools the oldest ones. The spooled
+    messages are sent again, oldest first, before the buffer once the
+    broker is back. A message may then be delivered twice. The messages
+    that cannot be spooled either stay in the buffer.
+
+    The buffer only lives in memory: the messages published during the
+    last flush_interval seconds are lost if the process is killed. The
+    job_finished events written to the outbox (JOBSTATE_SIDE_EFFECTS set
+    to "outbox") are only deleted once the dispatcher flushed them.
+    """
+
+    def __init__(
+        self,
+        broker_url,
+        spool_folder,
+        max_buffered=1000,
+        batch_size=100,
+        flush_interval=1.0,
+        connect_timeout=5,
+        exchange="dci.analytics.exchange",
+        queue="dci.analytics.queue",
+        routing_key="dci.analytics.jobs",
+    ):
+        self.broker_url = broker_url
+        self.spool_folder = spool_folder
+        self.max_buffered = max_buffered
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connect_timeout = connect_timeout
+        self._exchange = kombu.Exchange(exchange, type="direct")
+        self._queue = kombu.Queue(
+            name=queue, exchange=self._exchange, routing_key=routing_key
+        )
+        self._routing_key = routing_key
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._connection = None
+        self._producer = None
+        # the thread does not survive a fork, the workers start their own
+        self._pid = None
+        try:
+            os.makedirs(self.spool_folder, exist_ok=True)
+        except OSError as e:
+            logger.error("unable to create the AMQP spool folder: %s" % e)
+        _publishers.add(self)
+
+    def publish(self, message):
+        body = json.dumps(message, cls=utils.JSONEncoder)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            self._buffer.append(body)
+            nb_buffered = len(self._buffer)
+        if nb_buffered >= min(self.batch_size, self.max_buffered):
+            self._wakeup.set()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._connection = None
+        self._producer = None
+        thread = threading.Thread(target=self._run, name="amqp-publisher")
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("error while spooling the AMQP messages")
+
+    def _pop_batch(self, keep=0):
+        with self._lock:
+            nb_messages = min(self.batch_size, len(self._buffer) - keep)
+            return [self._buffer.popleft() for _ in range(nb_messages)]
+
+    def _requeue(self, batch):
+        with self._lock:
+            self._buffer.extendleft(reversed(batch))
+
+    def flush(self):
+        """Send the spooled messages then the buffer. Return False, with
+        the messages spooled or left in the buffer, when the broker is
+        unreachable."""
+        with self._flush_lock:
+            batch = []
+            if len(self._buffer) > self.max_buffered:
+                logger.warning("AMQP buffer full, messages spooled")
+                self._spool_buffer(keep=self.max_buffered)
+            try:
+                self._send_spool()
+                batch = self._pop_batch()
+                while batch:
+                    self._send(batch)
+                    batch = self._pop_batch()
+                return True
+            except Exception as e:
+                logger.error("error while publishing to the AMQP broker: %s" % e)
+                self._reset()
+                self._requeue(batch)
+                self._spool_buffer()
+                return False
+
+    def close(self):
+        """Spool the buffer, the next process sends it."""
+        with self._flush_lock:
+            self._spool_buffer()
+            self._reset()
+
+    def _get_producer(self):
+        if self._producer is None:
+            self._connection = kombu.Connection(
+                self.broker_url,
+                connect_timeout=self.connect_timeout,
+                transport_options={"confirm_publish": True},
+            )
+            self._connection.ensure_connection(max_retries=1)
+            channel = self._connection.channel()
+            self._queue.maybe_bind(channel)
+            self._queue.declare()
+            self._producer = kombu.Producer(
+                channel, exchange=self._exchange, routing_key=self._routing_key
+            )
+        return self._producer
+
+    def _reset(self):
+        if self._connection is not None:
+            try:
+                self._connection.release()
+            except Exception:
+                pass
+        self._connection = None
+        self._producer = None
+
+    def _send(self, batch):
+        producer = self._get_producer()
+        for body in batch:
+            producer.publish(
+                body, content_type="application/json", content_encoding="utf-8"
+            )
+
+    def _spool(self, batch):
+        name = "%020d-%s.json" % (time.time() * 1e6, utils.gen_uuid())
+        path = os.path.join(self.spool_folder, name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(batch, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(path + ".tmp", path)
+
+    def _spool_buffer(self, keep=0):
+        """Spool the oldest messages of the buffer until keep are left. A
+        batch that cannot be spooled goes back to the buffer."""
+        batch = self._pop_batch(keep)
+        while batch:
+            try:
+                self._spool(batch)
+            except Exception:
+                logger.exception("error while spooling the AMQP messages")
+                self._requeue(batch)
+                return
+            batch = self._pop_batch(keep)
+
+    def _send_spool(self):
+        if not os.path.exists(self.spool_folder):
+            return
+        for name in sorted(os.listdir(self.spool_folder)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.spool_folder, name)
+            try:
+                f = open(path)
+            except FileNotFoundError:
+                continue
+            with f:
+                # the workers of the same host share the spool folder
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                if os.fstat(f.fileno()).st_nlink == 0:
+                    continue
+                self._send(json.load(f))
+                os.unlink(path)
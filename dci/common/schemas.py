@@ -150,13 +150,17 @@ args_schema = {
         "sort": Properties.string,
         "where": Properties.key_value_csv,
         "embed": Properties.string,
+        "fields": Properties.string,
         "query": Properties.string,
         "created_after": Properties.isoformat_date,
         "updated_after": Properties.isoformat_date,
+        "after": Properties.string,
+        "count": Properties.enum(["exact", "estimated", "none"]),
     },
     "dependencies": {
-        "limit": {"required": ["offset"]},
+        "limit": {"anyOf": [{"required": ["offset"]}, {"required": ["after"]}]},
         "offset": {"required": ["limit"]},
+        "after": {"not": {"required": ["offset"]}},
     },
     "additionalProperties": False,
 }
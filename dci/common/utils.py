@@ -24,8 +24,14 @@ try:
 except ImportError:
     import simplejson as json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 import six
 from sqlalchemy.engine import result
+from werkzeug import http
 from werkzeug.routing import BaseConverter, ValidationError
 
 from dci.common import exceptions
@@ -65,6 +71,45 @@ class JSONEncoder(json.JSONEncoder):
             return str(o)
 
 
+class ORJSONEncoder(JSONEncoder):
+    """JSON encoder based on orjson.
+
+    orjson encodes UUID and datetime natively, only the other types go
+    through default(). The output is not byte-identical to JSONEncoder: it
+    is compact, not ASCII escaped, and NaN and Infinity become null. What
+    orjson can't encode (indentation other than 2, integers above 64 bits)
+    falls back to JSONEncoder.
+    """
+
+    def encode(self, o):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent is not None:
+            if self.indent != 2:
+                return super(ORJSONEncoder, self).encode(o)
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode("utf-8")
+        except orjson.JSONEncodeError:
+            return super(ORJSONEncoder, self).encode(o)
+
+
+JSON_ENCODERS = {"json": JSONEncoder, "orjson": ORJSONEncoder}
+
+
+def get_json_encoder(backend):
+    """Return the JSON encoder class of the backend, fall back to the json
+    one when orjson is not installed."""
+
+    if backend not in JSON_ENCODERS:
+        raise ValueError("unknown JSON encoder backend '%s'" % backend)
+    if backend == "orjson" and orjson is None:
+        logger.warning("orjson is not installed, using the json encoder")
+        return JSONEncoder
+    return JSON_ENCODERS[backend]
+
+
 def gen_uuid():
     return str(uuid.uuid4())
 
@@ -88,6 +133,10 @@ def check_and_get_etag(headers):
         raise exceptions.DCIException(
             "'If-match' header must be provided", status_code=412
         )
+    # the weak entity tag of a GET document starts with the etag of the row
+    etag, weak = http.unquote_etag(if_match_etag)
+    if weak:
+        return etag.split("-")[0]
     return if_match_etag
 
 
@@ -15,69 +15,304 @@
 # under the License.
 
 from dci.common import exceptions as dci_exc
+from dci.common import utils
 from dci.db import query_dsl
 
+import base64
+import json
 import pyparsing as pp
-from sqlalchemy import func, String
-from sqlalchemy.types import ARRAY
-from sqlalchemy.sql.expression import cast
+from sqlalchemy import func, inspect, literal, String, tuple_
+from sqlalchemy import orm as sa_orm
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.types import ARRAY, DateTime, JSON
+from sqlalchemy.sql.expression import cast, ClauseElement, Executable
+from sqlalchemy_utils import JSONType
 import datetime
 import uuid
 
 
-class Mixin(object):
-    def serialize(self, ignore_columns=[]):
-        def _get_nested_columns():
-            _res = {}
-            for ic in ignore_columns:
-                if "." in ic:
-                    k, v = ic.split(".")
-                    if k not in _res:
-                        _res[k] = [v]
-                    else:
-                        _res[k].append(v)
-            return _res
-
-        nested_ignore_columns = []
+def _get_nested_ignore_columns(ignore_columns):
+    nested_ignore_columns = {}
+    for ic in ignore_columns:
+        if "." in ic:
+            k, v = ic.split(".")
+            nested_ignore_columns.setdefault(k, []).append(v)
+    return nested_ignore_columns
+
+
+def _serialize_value(value, ignore_columns):
+    if isinstance(value, list):
+        return [
+            v.serialize(ignore_columns=ignore_columns) if isinstance(v, Mixin) else v
+            for v in value
+        ]
+    elif isinstance(value, Mixin):
+        return value.serialize(ignore_columns=ignore_columns)
+    elif isinstance(value, uuid.UUID):
+        return str(value)
+    elif isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _serialize_uuid(value, ignore_columns):
+    return None if value is None else str(value)
+
+
+def _serialize_datetime(value, ignore_columns):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _serialize_list(value, ignore_columns):
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _serialize_relationship_list(value, ignore_columns):
+    return [v.serialize(ignore_columns=ignore_columns) for v in value]
+
+
+def _serialize_relationship(value, ignore_columns):
+    return None if value is None else value.serialize(ignore_columns=ignore_columns)
+
+
+def _get_column_serializer(column):
+    if isinstance(column.type, UUID):
+        return _serialize_uuid
+    elif isinstance(column.type, DateTime):
+        return _serialize_datetime
+    elif isinstance(column.type, (ARRAY, JSON, JSONType)):
+        return _serialize_list
+    # the value is returned as is
+    return None
+
+
+class _Serializer(object):
+    """Serializer of a mapped class, the attribute converters are computed
+    once from the mapper instead of inspecting every value."""
+
+    def __init__(self, model_class):
+        mapper = inspect(model_class)
+        self.converters = {}
+        for column_property in mapper.column_attrs:
+            self.converters[column_property.key] = _get_column_serializer(
+                column_property.columns[0]
+            )
+        for relationship in mapper.relationships:
+            if not issubclass(relationship.mapper.class_, Mixin):
+                self.converters[relationship.key] = _serialize_value
+            elif relationship.uselist:
+                self.converters[relationship.key] = _serialize_relationship_list
+            else:
+                self.converters[relationship.key] = _serialize_relationship
+
+    def __call__(self, obj, ignore_columns):
+        nested_ignore_columns = {}
         if ignore_columns:
-            nested_ignore_columns = _get_nested_columns()
+            nested_ignore_columns = _get_nested_ignore_columns(ignore_columns)
+        converters = self.converters
         _dict = {}
-        _attrs = self.__dict__.keys()
-
-        for attr in _attrs:
+        # only the loaded attributes are in __dict__
+        for attr, value in obj.__dict__.items():
             if attr in ignore_columns:
                 continue
-            attr_obj = getattr(self, attr)
-            if isinstance(attr_obj, list):
-                _dict[attr] = []
-                for ao in attr_obj:
-                    _ignore_columns = []
-                    if attr in nested_ignore_columns:
-                        _ignore_columns = nested_ignore_columns[attr]
-                    if isinstance(ao, Mixin):
-                        _dict[attr].append(ao.serialize(ignore_columns=_ignore_columns))
-                    else:
-                        _dict[attr].append(ao)
-            elif isinstance(attr_obj, Mixin):
-                _ignore_columns = []
-                if attr in nested_ignore_columns:
-                    _ignore_columns = nested_ignore_columns[attr]
-                _dict[attr] = attr_obj.serialize(ignore_columns=_ignore_columns)
-            elif isinstance(attr_obj, uuid.UUID):
-                _dict[attr] = str(attr_obj)
-            elif isinstance(attr_obj, datetime.datetime):
-                _dict[attr] = attr_obj.isoformat()
-            elif not attr.startswith("_"):
-                _dict[attr] = self.__dict__[attr]
+            if attr in converters:
+                converter = converters[attr]
+                if converter is None:
+                    _dict[attr] = value
+                else:
+                    _dict[attr] = converter(value, nested_ignore_columns.get(attr, []))
+            elif not attr.startswith("_") or isinstance(
+                value, (list, Mixin, uuid.UUID, datetime.datetime)
+            ):
+                _dict[attr] = _serialize_value(
+                    value, nested_ignore_columns.get(attr, [])
+                )
         return _dict
 
 
-def handle_pagination(query, args):
+_serializers = {}
+
+
+def _get_json_value(column, value):
+    if isinstance(column.type, DateTime):
+        # datetime.isoformat() omits the microseconds when they are 0
+        return func.regexp_replace(
+            func.to_char(value, 'YYYY-MM-DD"T"HH24:MI:SS.US'), r"\.000000$", ""
+        )
+    return value
+
+
+def get_json_object(model_object, extra_values=()):
+    """Return the json_build_object() SQL expression of the rows of
+    model_object, it builds the same document as serialize() does with the
+    columns. extra_values are (key, SQL expression) pairs added to it."""
+    values = []
+    for column_property in inspect(model_object).column_attrs:
+        column = column_property.columns[0]
+        values.append(literal(column_property.key))
+        values.append(
+            _get_json_value(column, getattr(model_object, column_property.key))
+        )
+    for key, value in extra_values:
+        values.append(literal(key))
+        values.append(value)
+    return func.json_build_object(*values)
+
+
+class Mixin(object):
+    def serialize(self, ignore_columns=[]):
+        model_class = type(self)
+        serializer = _serializers.get(model_class)
+        if serializer is None:
+            serializer = _serializers[model_class] = _Serializer(model_class)
+        return serializer(self, ignore_columns)
+
+
+# Below this planner estimate, the rows are counted
+COUNT_ESTIMATE_MIN = 1000
+
+
+class _Explain(Executable, ClauseElement):
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) %s" % compiler.process(element.statement, **kw)
+
+
+def _get_estimated_count(query):
+    statement = query.enable_eagerloads(False).order_by(None).statement
+    plan = query.session.execute(_Explain(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_count(query, args):
+    """Count the rows of the query according to the count argument:
+    "exact" (default), "estimated" which uses the planner estimate when it
+    is large enough to matter, or "none" which skips the count and returns
+    None."""
+    count = args.get("count", "exact")
+    if count == "none":
+        return None
+    if count == "estimated":
+        estimated_count = _get_estimated_count(query)
+        if estimated_count >= COUNT_ESTIMATE_MIN:
+            return estimated_count
+    return query.count()
+
+
+def _get_limit(args):
     limit_max = 200
     default_limit = 20
+    return min(args.get("limit", default_limit), limit_max)
+
+
+def _get_cursor_sort_keys(model_object):
+    """Return the columns a cursor can be built on: the non nullable ones
+    leading an index, so that a page is an index range scan."""
+    table = model_object.__table__
+    columns = set([list(table.primary_key.columns)[0]])
+    columns.update(c for c in table.columns if c.index or c.unique)
+    for index in table.indexes:
+        if index.dialect_options["postgresql"]["where"] is None:
+            columns.add(list(index.columns)[0])
+    return sorted(
+        k
+        for k, c in model_object.__mapper__.columns.items()
+        if c in columns and not c.nullable
+    )
+
+
+def _get_cursor_sort(model_object, args):
+    sort = args.get("sort") or ["-created_at"]
+    if len(sort) != 1:
+        raise dci_exc.DCIException("Cursor pagination requires a single sort key")
+    key = sort[0].lstrip("-")
+    valid_keys = _get_cursor_sort_keys(model_object)
+    if key not in valid_keys:
+        raise dci_exc.DCIException(
+            'Invalid cursor sort key: "%s"' % key,
+            payload={"Valid cursor sort keys": valid_keys},
+        )
+    return sort[0], key, not sort[0].startswith("-")
+
+
+def _get_cursor_columns(model_object, key):
+    columns = [getattr(model_object, key)]
+    if key != "id":
+        columns.append(getattr(model_object, "id"))
+    return columns
+
+
+def _encode_cursor(sort, values):
+    cursor = json.dumps({"sort": sort, "values": values}, cls=utils.JSONEncoder)
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor, sort, nb_values):
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        values = decoded["values"]
+        if decoded["sort"] == sort and len(values) == nb_values:
+            return values
+    except (KeyError, TypeError, ValueError):
+        pass
+    raise dci_exc.DCIException('Invalid cursor: "%s"' % cursor)
+
+
+def get_cursor_builder(model_object, args):
+    """Return a function building the cursor of the next page, _meta.next,
+    from the last row of the page and its number of rows. Return None when
+    the cursor pagination is not used.
+    """
+    if "after" not in args:
+        return None
+    sort, key, _ = _get_cursor_sort(model_object, args)
+    limit = _get_limit(args)
+
+    def build_cursor(last_row, nb_rows):
+        if last_row is None or nb_rows < limit:
+            return None
+        values = [
+            getattr(last_row, c.key) for c in _get_cursor_columns(model_object, key)
+        ]
+        return _encode_cursor(sort, values)
+
+    return build_cursor
+
+
+def handle_pagination(query, args, model_object=None):
+    """Paginate with offset and limit, or with a cursor when the "after"
+    argument is given. An empty cursor requests the first page. The cursor
+    pagination is only available when model_object is given."""
+    if "after" in args:
+        if model_object is None:
+            raise dci_exc.DCIException(
+                "Cursor pagination is not supported on this resource"
+            )
+        if args["after"]:
+            sort, key, asc = _get_cursor_sort(model_object, args)
+            columns = _get_cursor_columns(model_object, key)
+            values = _decode_cursor(args["after"], sort, len(columns))
+            values = [literal(v, type_=c.type) for c, v in zip(columns, values)]
+            if asc:
+                query = query.filter(tuple_(*columns) > tuple_(*values))
+            else:
+                query = query.filter(tuple_(*columns) < tuple_(*values))
+        return query.limit(_get_limit(args))
+
     default_offset = 0
     query = query.offset(args.get("offset", default_offset))
-    query = query.limit(min(args.get("limit", default_limit), limit_max))
+    query = query.limit(_get_limit(args))
     return query
 
 
@@ -100,6 +335,13 @@ def handle_args(query, model_object, args):
                 query = query.order_by(getattr(model_object, s).desc())
     else:
         query = query.order_by(getattr(model_object, "created_at").desc())
+    if "after" in args:
+        # the id makes the order total, the rows sharing a sort value are
+        # not skipped or repeated from one page to the other
+        _, key, asc = _get_cursor_sort(model_object, args)
+        if key != "id":
+            id_column = getattr(model_object, "id")
+            query = query.order_by(id_column.asc() if asc else id_column.desc())
     where = args.get("where")
     if where:
         columns = model_object.__mapper__.columns.keys()
@@ -160,3 +402,38 @@ def handle_args(query, model_object, args):
             getattr(model_object, "updated_at") >= args.get("updated_after")
         )
     return query
+
+
+def handle_embed(query, args, embeds, default_embeds=None):
+    """Eager load the relationships requested by the embed argument. embeds
+    maps the relationships a listing can embed to their loader option, the
+    unknown names are ignored. Without embed, the default_embeds (all of them
+    by default) are loaded, unless the fields argument narrows the listing."""
+    names = set(e.split(".")[0] for e in args.get("embed", []))
+    if not names and not args.get("fields"):
+        names = set(embeds if default_embeds is None else default_embeds)
+    for name, option in embeds.items():
+        if name in names:
+            query = query.options(option)
+    return query
+
+
+def handle_fields(query, model_object, args):
+    """Only load the columns requested by the fields argument, the id and
+    the sort keys are loaded too."""
+    fields = args.get("fields")
+    if not fields:
+        return query
+    columns = model_object.__mapper__.columns.keys()
+    for f in fields:
+        if f not in columns:
+            raise dci_exc.DCIException(
+                'Invalid field: "%s"' % f,
+                payload={"Valid fields": sorted(set(columns))},
+            )
+    loaded_columns = set(fields)
+    loaded_columns.add("id")
+    loaded_columns.update(s.lstrip("-") for s in args.get("sort") or [])
+    if "after" in args:
+        loaded_columns.add(_get_cursor_sort(model_object, args)[1])
+    return query.options(sa_orm.load_only(*sorted(loaded_columns)))
@@ -354,7 +354,10 @@ class Feeder(dci_declarative.Mixin, Base):
 
 class Log(Base):
     __tablename__ = "logs"
-    __table_args__ = (sa.Index("logs_user_id_idx", "user_id"),)
+    __table_args__ = (
+        sa.Index("logs_user_id_idx", "user_id"),
+        sa.Index("logs_created_at_idx", "created_at"),
+    )
     id = sa.Column(pg.UUID(as_uuid=True), primary_key=True, default=utils.gen_uuid)
     created_at = sa.Column(
         sa.DateTime(), default=datetime.datetime.utcnow, nullable=False
@@ -439,6 +442,8 @@ class Component(dci_declarative.Mixin, Base):
             ),
         ),
         sa.Index("components_topic_id_idx", "topic_id"),
+        sa.Index("components_created_at_idx", "created_at"),
+        sa.Index("components_released_at_idx", "released_at"),
     )
 
     id = sa.Column(pg.UUID(as_uuid=True), primary_key=True, default=utils.gen_uuid)
@@ -485,6 +490,19 @@ class Component(dci_declarative.Mixin, Base):
     )
 
 
+# the latest exported component of each type of a topic is a single index
+# lookup per type
+sa.Index(
+    "components_latest_by_type_idx",
+    Component.topic_id,
+    Component.type,
+    Component.created_at.desc(),
+    postgresql_where=sa.sql.text(
+        "components.state = 'active' AND components.team_id is NULL"
+    ),
+)
+
+
 class Job(dci_declarative.Mixin, Base):
     __tablename__ = "jobs"
     __table_args__ = (
@@ -571,6 +589,23 @@ class Job(dci_declarative.Mixin, Base):
     keys_values = sa_orm.relationship("JobKeyValue")
 
 
+# the previous job of a remoteci in a topic, and the jobs list of a team,
+# are read in created_at order from the index and stop at the limit
+sa.Index(
+    "jobs_remoteci_id_topic_id_created_at_idx",
+    Job.remoteci_id,
+    Job.topic_id,
+    Job.created_at.desc(),
+    postgresql_where=sa.sql.text("jobs.state != 'archived'"),
+)
+sa.Index(
+    "jobs_team_id_created_at_idx",
+    Job.team_id,
+    Job.created_at.desc(),
+    postgresql_where=sa.sql.text("jobs.state != 'archived'"),
+)
+
+
 class JobKeyValue(dci_declarative.Mixin, Base):
     __tablename__ = "jobs_keys_values"
     __table_args__ = (
@@ -689,7 +724,10 @@ class File(dci_declarative.Mixin, Base):
 
 class JobEvent(dci_declarative.Mixin, Base):
     __tablename__ = "jobs_events"
-    __table_args__ = (sa.Index("jobs_events_job_id_idx", "job_id"),)
+    __table_args__ = (
+        sa.Index("jobs_events_job_id_idx", "job_id"),
+        sa.Index("jobs_events_created_at_idx", "created_at"),
+    )
     id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
     created_at = sa.Column(
         sa.DateTime(), default=datetime.datetime.utcnow, nullable=False
@@ -699,6 +737,19 @@ class JobEvent(dci_declarative.Mixin, Base):
     status = sa.Column("status", FINAL_STATUSES_ENUM)
 
 
+# side effects of a request, written in the transaction of the request and
+# run later by bin/dci-outbox-dispatcher
+class OutboxEvent(dci_declarative.Mixin, Base):
+    __tablename__ = "outbox_events"
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    created_at = sa.Column(
+        sa.DateTime(), default=datetime.datetime.utcnow, nullable=False
+    )
+    event = sa.Column(sa.String(255), nullable=False)
+    data = sa.Column(sa_utils.JSONType, default={})
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+
+
 class Counter(dci_declarative.Mixin, Base):
     __tablename__ = "counter"
     name = sa.Column(sa.String(255), primary_key=True, nullable=False)
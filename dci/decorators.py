@@ -72,6 +72,33 @@ def login_required(f):
     return decorated
 
 
+def _release_db_connection():
+    session = flask.g.pop("session", None)
+    if session is not None:
+        session.close()
+    db_conn = flask.g.pop("db_conn", None)
+    if db_conn is not None:
+        db_conn.close()
+
+
+def admission_controlled(admission_controller):
+    """Run the view under the admission controller, the requests of a team
+    share the same queue. The database connection the authentication may
+    have used goes back to the pool while the request waits."""
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(user, *args, **kwargs):
+            _release_db_connection()
+            key = str(user.teams_ids[0]) if user.teams_ids else str(user.id)
+            with admission_controller.admit(key):
+                return f(user, *args, **kwargs)
+
+        return decorated
+
+    return decorator
+
+
 def log(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -103,7 +130,8 @@ def log_file_info(f):
             key = key.lower().replace("dci-", "").replace("-", "_")
             if key in ["md5", "mime", "jobstate_id", "job_id", "name", "test_id"]:
                 logger.info("DCI-%s:%s" % (key.upper(), value))
-        logger.info("DCI-FILE-SIZE:%s" % len(flask.request.data))
+        # the body is streamed to the store, it must not be read here
+        logger.info("DCI-FILE-SIZE:%s" % flask.request.content_length)
         return f(*args, **kwargs)
 
     return decorated
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+import time
+
+import flask
+from sqlalchemy.orm import sessionmaker
+
+from dci.api.v1 import jobstates
+from dci.db import models2
+
+logger = logging.getLogger(__name__)
+
+
+def _job_finished(data):
+    jobstates.notify_job_finished(jobstates.serialize_job(data["job_id"]))
+
+
+HANDLERS = {"job_finished": _job_finished}
+
+
+def dispatch(session, batch_size=50, max_attempts=5):
+    """Run the handlers of the oldest outbox events and delete them, in
+    an app context where flask.g holds the session, the zmq sender and
+    the messaging producer.
+
+    The events are locked with SKIP LOCKED, several dispatchers can run
+    at the same time. An event whose handler fails is kept for the next
+    call, until it failed max_attempts times. Return the number of
+    events read.
+
+    The delivery is at least once: the handlers send their mails and
+    messages outside of the transaction. If the commit deleting the
+    events fails, or the dispatcher dies before it, their handlers run
+    again, so the consumers of these notifications can get duplicates."""
+    events = (
+        session.query(models2.OutboxEvent)
+        .filter(models2.OutboxEvent.attempts < max_attempts)
+        .order_by(models2.OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for event in events:
+        try:
+            with session.begin_nested():
+                HANDLERS[event.event](event.data)
+        except Exception:
+            logger.exception("outbox event %s %s failed" % (event.id, event.event))
+            event.attempts += 1
+        else:
+            session.delete(event)
+    if events:
+        # the AMQP messages of the handlers are sent or spooled before the
+        # events are deleted
+        flask.g.messaging.flush()
+    session.commit()
+    return len(events)
+
+
+def run(dci_app):
+    """Dispatch the outbox events forever. Each loop opens its own session
+    and app context, nothing is kept from one batch to the next."""
+    config = dci_app.config
+    Session = sessionmaker(bind=dci_app.engine)
+    while True:
+        session = Session()
+        try:
+            with dci_app.app_context():
+                flask.g.session = session
+                flask.g.sender = dci_app.sender
+                flask.g.messaging = dci_app.messaging
+                nb_events = dispatch(
+                    session, config["OUTBOX_BATCH_SIZE"], config["OUTBOX_MAX_ATTEMPTS"]
+                )
+        except Exception:
+            logger.exception("error while dispatching the outbox events")
+            session.rollback()
+            nb_events = 0
+        finally:
+            session.close()
+        if nb_events < config["OUTBOX_BATCH_SIZE"]:
+            time.sleep(config["OUTBOX_POLL_INTERVAL"])
@@ -29,6 +29,11 @@ class Store(object):
     def upload(self, container, filename, iterable):
         pass
 
+    def get_path(self, container, filename):
+        """Return the local path of the file, None when the store is not
+        on the local filesystem."""
+        return None
+
     def _get_container(self, container_name):
         if container_name not in self.containers:
             raise exceptions.StoreException(
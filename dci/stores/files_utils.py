@@ -18,8 +18,13 @@
 import logging
 import hashlib
 
+from dci.common import exceptions
+
 logger = logging.getLogger(__name__)
 
+# size of the chunks read from the uploads
+CHUNK_SIZE = 64 * 1024
+
 
 def build_file_path(root, middle, file_id):
     root = str(root)
@@ -37,3 +42,30 @@ def md5Checksum(filePath):
                 break
             m.update(data)
         return m.hexdigest()
+
+
+class ChecksumReader(object):
+    """Read a stream chunk by chunk for a store upload and compute the size
+    and the md5 of what has been read, the content is never held in memory
+    as a whole."""
+
+    def __init__(self, stream, max_size=None):
+        self._stream = stream
+        self._md5 = hashlib.md5()
+        self.max_size = max_size
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise exceptions.DCIException(
+                "File too large, the maximum size is %s bytes" % self.max_size,
+                status_code=413,
+            )
+        self._md5.update(data)
+        return data
+
+    @property
+    def md5(self):
+        return self._md5.hexdigest()
@@ -16,8 +16,10 @@
 
 from dci import stores
 from dci.common import exceptions
+from dci.common import utils
 from dci.stores import files_utils
 
+import io
 import logging
 import os
 import errno
@@ -34,17 +36,48 @@ class FileSystem(stores.Store):
         container = self._get_container(container_name)
         return os.path.join(self.path, container)
 
+    def _get_checksum_path(self, file_path):
+        return file_path + ".md5"
+
+    def _write_checksum(self, file_path, md5):
+        checksum_path = self._get_checksum_path(file_path)
+        tmp_path = "%s.%s.tmp" % (checksum_path, utils.gen_uuid())
+        with open(tmp_path, "w") as f:
+            f.write(md5)
+        os.rename(tmp_path, checksum_path)
+
+    def _read_checksum(self, file_path, file_stat):
+        """Return the md5 written by upload, None when the file has no
+        checksum yet or has been modified after it."""
+        checksum_path = self._get_checksum_path(file_path)
+        try:
+            with open(checksum_path) as f:
+                if os.fstat(f.fileno()).st_mtime_ns < file_stat.st_mtime_ns:
+                    return None
+                return f.read()
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
     def delete(self, container_name, filename):
         root_directory = self._get_root_directory(container_name)
         file_path = os.path.join(root_directory, filename)
+        try:
+            os.remove(self._get_checksum_path(file_path))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning(
+                    "error while deleting the checksum of %s: %s" % (file_path, e)
+                )
         try:
             os.remove(file_path)
         except OSError as e:
             status_code = 400
             if e.errno == errno.ENOENT:
-                logger.warn("file %s not found in local filesystem" % file_path)
+                logger.warning("file %s not found in local filesystem" % file_path)
                 return
-            raise exceptions.StoreExceptions(
+            raise exceptions.StoreException(
                 "Error while deleting file " "%s: %s" % (filename, str(e)),
                 status_code=status_code,
             )
@@ -53,32 +86,45 @@ class FileSystem(stores.Store):
         root_directory = self._get_root_directory(container_name)
         file_path = os.path.join(root_directory, filename)
         try:
-            return ([], open(file_path, "r"))
+            return ([], open(file_path, "rb"))
         except IOError as e:
             status_code = 400
             if e.errno == errno.ENOENT:
                 status_code = 404
-            raise exceptions.StoreExceptions(
+            raise exceptions.StoreException(
                 "Error while accessing file " "%s: %s" % (filename, str(e)),
                 status_code=status_code,
             )
 
+    def get_path(self, container_name, filename):
+        root_directory = self._get_root_directory(container_name)
+        return os.path.join(root_directory, filename)
+
     def head(self, container_name, filename):
         root_directory = self._get_root_directory(container_name)
         file_path = os.path.join(root_directory, filename)
         try:
-            file_size = os.path.getsize(file_path)
+            file_stat = os.stat(file_path)
         except IOError as e:
             status_code = 400
             if e.errno == errno.ENOENT:
                 status_code = 404
-            raise exceptions.StoreExceptions(
+            raise exceptions.StoreException(
                 "Error while accessing file " "%s: %s" % (filename, str(e)),
                 status_code=status_code,
             )
-        md5 = files_utils.md5Checksum(file_path)
+        md5 = self._read_checksum(file_path, file_stat)
+        if md5 is None:
+            # the files uploaded before the checksums were stored
+            md5 = files_utils.md5Checksum(file_path)
+            try:
+                self._write_checksum(file_path, md5)
+            except IOError as e:
+                logger.warning(
+                    "error while writing the checksum of %s: %s" % (file_path, e)
+                )
         return {
-            "content-length": file_size,
+            "content-length": file_stat.st_size,
             "etag": md5,
             "content-type": "application/octet-stream",
         }
@@ -91,12 +137,15 @@ class FileSystem(stores.Store):
         if not os.path.exists(path):
             os.makedirs(path)
 
+        if not hasattr(iterable, "read"):
+            iterable = io.BytesIO(iterable)
+        # the uploads of the API are already read through a ChecksumReader
+        if not isinstance(iterable, files_utils.ChecksumReader) or iterable.size:
+            iterable = files_utils.ChecksumReader(iterable)
         with open(file_path, "wb") as f:
-            if hasattr(iterable, "read"):
-                while True:
-                    data = iterable.read(1024)
-                    if not data:
-                        break
-                    f.write(data)
-            else:
-                f.write(iterable)
+            while True:
+                data = iterable.read(files_utils.CHUNK_SIZE)
+                if not data:
+                    break
+                f.write(data)
+        self._write_checksum(file_path, iterable.md5)
@@ -14,6 +14,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import concurrent.futures
+import io
 import logging
 
 import boto3
@@ -33,8 +35,13 @@ class S3(stores.Store):
         self.aws_region = conf.get("aws_region")
         self.endpoint_url = conf.get("endpoint_url")
         self.signature_version = conf.get("signature_version")
+        # S3 refuses the parts smaller than 5MB, except the last one
+        self.part_size = conf.get("multipart_part_size") or 8 * 1024 * 1024
+        self.max_concurrency = conf.get("multipart_concurrency") or 4
 
         self.buckets = conf.get("buckets")
+        # the buckets are verified, and created, on their first upload
+        self.verified_buckets = set()
         self.s3_config = self.get_s3_config()
         self.s3 = self.get_s3()
 
@@ -110,8 +117,9 @@ class S3(stores.Store):
                 status_code=e.response["Error"]["Code"],
             )
 
-    def upload(self, container_name, filename, iterable):
-        bucket = self._get_container(container_name)
+    def _ensure_bucket(self, bucket, filename):
+        if bucket in self.verified_buckets:
+            return
         try:
             self.s3.head_bucket(Bucket=bucket)
         except ClientError as e:
@@ -130,5 +138,109 @@ class S3(stores.Store):
                     "Error while creating bucket for file '%s': %s" % (filename, e),
                     status_code=int(e.response["Error"]["Code"]),
                 )
+        self.verified_buckets.add(bucket)
+
+    def _call_in_bucket(self, method, bucket, filename, **kwargs):
+        """Call the s3 method, create the bucket again and retry once when
+        it has been deleted since it was verified."""
+        try:
+            return method(Bucket=bucket, Key=filename, **kwargs)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchBucket":
+                raise
+            logger.warning("bucket '%s' not found, verifying it again" % bucket)
+            self.verified_buckets.discard(bucket)
+            self._ensure_bucket(bucket, filename)
+            return method(Bucket=bucket, Key=filename, **kwargs)
+
+    def upload(self, container_name, filename, iterable):
+        bucket = self._get_container(container_name)
+        self._ensure_bucket(bucket, filename)
 
-        self.s3.put_object(Bucket=bucket, Key=filename, Body=iterable)
+        if not hasattr(iterable, "read"):
+            iterable = io.BytesIO(iterable)
+        # the body can be a non seekable stream, it is read part by part
+        part = self._read_part(iterable)
+        try:
+            if len(part) < self.part_size:
+                self._call_in_bucket(self.s3.put_object, bucket, filename, Body=part)
+            else:
+                self._multipart_upload(bucket, filename, part, iterable)
+        except ClientError as e:
+            raise exceptions.StoreException(
+                "Error while uploading file '%s': %s" % (filename, e),
+                status_code=e.response["Error"]["Code"],
+            )
+
+    def _read_part(self, iterable):
+        chunks = []
+        size = 0
+        while size < self.part_size:
+            chunk = iterable.read(self.part_size - size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        return b"".join(chunks)
+
+    def _upload_part(self, bucket, filename, upload_id, part_number, part):
+        r = self.s3.upload_part(
+            Bucket=bucket,
+            Key=filename,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=part,
+        )
+        return {"PartNumber": part_number, "ETag": r["ETag"]}
+
+    def _multipart_upload(self, bucket, filename, part, iterable):
+        """Upload the parts with max_concurrency threads. The next part is
+        read while the others are sent, at most max_concurrency + 1 parts
+        are held in memory. The upload is aborted on failure, S3 would
+        keep and bill the uploaded parts otherwise."""
+        upload_id = self._call_in_bucket(
+            self.s3.create_multipart_upload, bucket, filename
+        )["UploadId"]
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_concurrency
+            ) as executor:
+                futures = []
+                pending = set()
+                part_number = 1
+                while part:
+                    if len(pending) >= self.max_concurrency:
+                        done, pending = concurrent.futures.wait(
+                            pending, return_when=concurrent.futures.FIRST_COMPLETED
+                        )
+                        for future in done:
+                            future.result()
+                    future = executor.submit(
+                        self._upload_part,
+                        bucket,
+                        filename,
+                        upload_id,
+                        part_number,
+                        part,
+                    )
+                    futures.append(future)
+                    pending.add(future)
+                    part_number += 1
+                    part = self._read_part(iterable)
+                parts = [future.result() for future in futures]
+            self.s3.complete_multipart_upload(
+                Bucket=bucket,
+                Key=filename,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            try:
+                self.s3.abort_multipart_upload(
+                    Bucket=bucket, Key=filename, UploadId=upload_id
+                )
+            except ClientError as e:
+                logger.error(
+                    "Error while aborting the upload of file '%s': %s" % (filename, e)
+                )
+            raise
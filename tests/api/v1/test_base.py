@@ -14,6 +14,12 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
+
+import mock
+
+from dci.api.v1 import base
+
 
 def test_purge_resource(client_admin, rhel_product):
     data = {
@@ -137,3 +143,31 @@ def test_where_with_forbidden_column_names(client_user1):
 
     request = client_user1.get("/api/v1/jobs?where=cert_fp:brute_force")
     assert request.status_code == 400
+
+
+def test_purge_resources_are_streamed_by_chunks(client_admin, team_admin_id):
+    feeders_ids = set()
+    for i in range(5):
+        feeder = client_admin.post(
+            "/api/v1/feeders", data={"name": "feeder%s" % i, "team_id": team_admin_id}
+        ).data["feeder"]
+        client_admin.delete(
+            "/api/v1/feeders/%s" % feeder["id"],
+            headers={"If-match": feeder["etag"]},
+        )
+        feeders_ids.add(feeder["id"])
+
+    with mock.patch("dci.api.v1.base.STREAM_YIELD_PER", 2):
+        to_purge = client_admin.get("/api/v1/feeders/purge").data
+
+    assert to_purge["_meta"]["count"] == 5
+    assert set(f["id"] for f in to_purge["feeders"]) == feeders_ids
+
+
+def test_stream_resources_of_an_empty_list(app):
+    with app.test_request_context():
+        response = base.stream_resources("jobs", [], lambda j: j)
+        assert json.loads(response.get_data()) == {
+            "jobs": [],
+            "_meta": {"count": 0},
+        }
@@ -624,6 +624,27 @@ def test_get_component_by_id_or_name(client_admin, rhel_80_topic_id):
     assert created_ct["component"]["id"] == pc_id
 
 
+def test_get_component_by_id_if_none_match(
+    client_admin, hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
+):
+    url = "/api/v1/components/%s" % rhel_80_component_id
+    r = client_admin.get(url)
+    validator = r.headers["ETag"]
+    etag = r.data["component"]["etag"]
+    r = client_admin.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 304
+
+    # a new job of the component changes its document, not its etag
+    hmac_client_team1.post(
+        "/api/v1/jobs",
+        data={"components": [rhel_80_component_id], "topic_id": rhel_80_topic_id},
+    )
+    r = client_admin.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert len(r.data["component"]["jobs"]) == 1
+    assert r.data["component"]["etag"] == etag
+
+
 def test_nrt_get_component_by_id_return_list_of_jobs_only_from_team_of_the_user(
     team_admin_job, client_admin, client_user1
 ):
@@ -910,6 +931,26 @@ def test_download_file_from_component(client_admin, rhel_80_topic_id):
     assert d_file.data == '"lollollel"'
 
 
+def test_download_file_from_component_with_x_accel_redirect(
+    app, filesystem_store, client_admin, rhel_80_topic_id
+):
+    app.config["X_ACCEL_REDIRECT_LOCATION"] = "/store"
+    data = {"name": "pname1", "type": "gerrit_review", "topic_id": rhel_80_topic_id}
+    ct_1 = client_admin.post("/api/v1/components", data=data).data["component"]
+    url = "/api/v1/components/%s/files" % ct_1["id"]
+    c_file = client_admin.post(url, data="lollollel").data["component_file"]
+
+    url = "/api/v1/components/%s/files/%s/content" % (ct_1["id"], c_file["id"])
+    d_file = client_admin.get(url)
+    assert d_file.status_code == 200
+    assert d_file.data == ""
+    assert d_file.headers["X-Accel-Redirect"] == "/store/dci-components/%s/%s/%s" % (
+        rhel_80_topic_id,
+        ct_1["id"],
+        c_file["id"],
+    )
+
+
 def test_delete_file_from_component(client_admin, rhel_80_topic_id):
     data = {
         "name": "pname1",
@@ -1036,6 +1077,36 @@ def test_get_last_components_by_type(session, client_admin, rhel_80_topic):
     assert str(last_components[0].id) == components_ids[-1]
 
 
+def test_get_last_components_by_type_keeps_types_order(
+    session, client_admin, rhel_80_topic
+):
+    puddle_id = create_component(
+        client_admin, rhel_80_topic["id"], "puddle_osp", "puddle"
+    )
+    compose_ids = [
+        create_component(client_admin, rhel_80_topic["id"], "compose", "c-%s" % i)
+        for i in range(2)
+    ]
+
+    last_components = components.get_last_components_by_type(
+        ["puddle_osp", "compose"], topic_id=rhel_80_topic["id"], session=session
+    )
+    assert [str(c.id) for c in last_components] == [puddle_id, compose_ids[-1]]
+
+    with pytest.raises(dci_exc.DCIException) as e:
+        components.get_last_components_by_type(
+            ["compose", "missing"], topic_id=rhel_80_topic["id"], session=session
+        )
+    assert e.value.status_code == 412
+
+    with pytest.raises(dci_exc.DCIException) as e:
+        components.get_last_components_by_type(
+            ["compose", "compose"], topic_id=rhel_80_topic["id"], session=session
+        )
+    assert e.value.status_code == 412
+    assert "duplicated" in e.value.message
+
+
 def test_verify_and_get_components_ids(
     session, client_admin, rhel_80_topic, rhel_80_topic_id
 ):
@@ -17,6 +17,7 @@
 from __future__ import unicode_literals
 
 import base64
+import hashlib
 
 import flask
 import mock
@@ -47,6 +48,37 @@ def test_create_files(client_user1, team1_jobstate):
     assert file["size"] == 7
 
 
+def test_create_files_computes_the_size_and_the_md5(client_user1, team1_job_id):
+    content = "content" * 1000
+    file = t_utils.create_file(client_user1, team1_job_id, "file", content)
+    assert file["size"] == len(content)
+    assert file["md5"] == hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def test_create_large_files_with_hmac(hmac_client_team1, team1_job_id):
+    # the body of the signed requests over 1MB is spooled on disk
+    content = "x" * (2 * 1024 * 1024)
+    headers = {"DCI-JOB-ID": team1_job_id, "DCI-NAME": "large"}
+    r = hmac_client_team1.post("/api/v1/files", headers=headers, data=content)
+    assert r.status_code == 201
+    # the token based client sends the json encoded content
+    assert r.data["file"]["size"] == len(content) + 2
+
+    r = hmac_client_team1.get("/api/v1/files/%s/content" % r.data["file"]["id"])
+    assert r.status_code == 200
+    assert r.data == content
+
+
+def test_create_files_too_large(app, client_user1, team1_job_id):
+    app.config["MAX_CONTENT_LENGTH"] = 10
+    headers = {"DCI-JOB-ID": team1_job_id, "DCI-NAME": "file"}
+    r = client_user1.post("/api/v1/files", headers=headers, data="x" * 11)
+    assert r.status_code == 413
+
+    files = client_user1.get("/api/v1/jobs/%s/files" % team1_job_id).data["files"]
+    assert files == []
+
+
 def test_job_update_on_creation_deletion_file(client_user1, team1_job_id):
     job = client_user1.get("/api/v1/jobs/%s" % team1_job_id).data["job"]
     job_updated_at = job["updated_at"]
@@ -228,6 +260,48 @@ def test_get_file_content_as_user(client_user1, team1_jobstate):
     assert get_file.data == content
 
 
+def test_get_file_content_from_the_filesystem(
+    filesystem_store, client_user1, team1_job_id
+):
+    file = t_utils.create_file(client_user1, team1_job_id, "foo", "azertyuiop")
+
+    r = client_user1.get("/api/v1/files/%s/content" % file["id"])
+    assert r.status_code == 200
+    assert r.data == "azertyuiop"
+    assert r.headers["Content-Length"] == "10"
+    assert r.headers["Content-Disposition"] == "attachment; filename=foo"
+
+
+def test_get_file_content_with_x_sendfile(
+    app, filesystem_store, client_user1, team1_job_id
+):
+    app.config["USE_X_SENDFILE"] = True
+    file = t_utils.create_file(client_user1, team1_job_id, "foo", "azertyuiop")
+
+    r = client_user1.get("/api/v1/files/%s/content" % file["id"])
+    assert r.status_code == 200
+    assert r.data == ""
+    file_path = files_utils.build_file_path(file["team_id"], team1_job_id, file["id"])
+    assert r.headers["X-Sendfile"] == filesystem_store.get_path("files", file_path)
+
+
+def test_get_file_content_with_x_accel_redirect(
+    app, filesystem_store, client_user1, team1_job_id
+):
+    app.config["X_ACCEL_REDIRECT_LOCATION"] = "/store/"
+    file = t_utils.create_file(client_user1, team1_job_id, "foo", "azertyuiop")
+
+    r = client_user1.get("/api/v1/files/%s/content" % file["id"])
+    assert r.status_code == 200
+    assert r.data == ""
+    assert r.headers["X-Accel-Redirect"] == "/store/dci-files/%s/%s/%s" % (
+        file["team_id"],
+        team1_job_id,
+        file["id"],
+    )
+    assert r.headers["Content-Disposition"] == "attachment; filename=foo"
+
+
 def test_change_file_to_invalid_state(client_admin, team1_jobstate_file):
     t = client_admin.get("/api/v1/files/" + team1_jobstate_file).data["file"]
     data = {"state": "file"}
@@ -29,7 +29,6 @@ from dci.stores.s3 import S3
 from tests.data import JUNIT
 import tests.utils as t_utils
 
-
 AWSS3 = "dci.stores.s3.S3"
 
 
@@ -106,6 +105,25 @@ def test_create_jobs_with_team_components(
     assert set(job_components_ids) == set(components_ids)
 
 
+def test_create_jobs_is_atomic(
+    hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
+):
+    nb_jobs = hmac_client_team1.get("/api/v1/jobs").data["_meta"]["count"]
+
+    data = {
+        "topic_id": rhel_80_topic_id,
+        "components": [rhel_80_component_id, "ec9f9d1d-f5dd-4a46-9d56-4e2ef2c4c5a1"],
+    }
+    r = hmac_client_team1.post("/api/v1/jobs", data=data)
+    assert r.status_code == 404
+
+    data["components"] = [rhel_80_component_id, rhel_80_component_id]
+    r = hmac_client_team1.post("/api/v1/jobs", data=data)
+    assert r.status_code == 409
+
+    assert hmac_client_team1.get("/api/v1/jobs").data["_meta"]["count"] == nb_jobs
+
+
 def test_add_component_to_job(client_user1, team1_id, rhel_80_topic_id, team1_job_id):
     data = {
         "name": "pname",
@@ -346,6 +364,111 @@ def test_get_all_jobs_with_pagination(
     assert jobs.data["jobs"] == []
 
 
+def test_get_all_jobs_with_cursor_pagination(
+    hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
+):
+    data = {"components": [rhel_80_component_id], "topic_id": rhel_80_topic_id}
+    for _ in range(5):
+        hmac_client_team1.post("/api/v1/jobs", data=data)
+    all_jobs = hmac_client_team1.get("/api/v1/jobs").data["jobs"]
+
+    pages = []
+    jobs = hmac_client_team1.get("/api/v1/jobs?limit=2&after=").data
+    while jobs["jobs"]:
+        assert jobs["_meta"]["count"] == 5
+        pages.append([j["id"] for j in jobs["jobs"]])
+        if jobs["_meta"]["next"] is None:
+            break
+        jobs = hmac_client_team1.get(
+            "/api/v1/jobs?limit=2&after=%s" % jobs["_meta"]["next"]
+        ).data
+    assert pages[:3] == [
+        [all_jobs[0]["id"], all_jobs[1]["id"]],
+        [all_jobs[2]["id"], all_jobs[3]["id"]],
+        [all_jobs[4]["id"]],
+    ]
+
+    jobs = hmac_client_team1.get("/api/v1/jobs?sort=created_at&limit=10&after=").data
+    assert [j["id"] for j in jobs["jobs"]] == [j["id"] for j in all_jobs[::-1]]
+    assert jobs["_meta"]["next"] is None
+
+
+def test_get_all_jobs_count_modes(
+    hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
+):
+    data = {"components": [rhel_80_component_id], "topic_id": rhel_80_topic_id}
+    for _ in range(3):
+        hmac_client_team1.post("/api/v1/jobs", data=data)
+
+    jobs = hmac_client_team1.get("/api/v1/jobs?count=exact").data
+    assert jobs["_meta"]["count"] == 3
+    jobs = hmac_client_team1.get("/api/v1/jobs?count=none").data
+    assert jobs["_meta"]["count"] is None
+    assert len(jobs["jobs"]) == 3
+    # small estimates are replaced by the exact count
+    jobs = hmac_client_team1.get("/api/v1/jobs?count=estimated").data
+    assert jobs["_meta"]["count"] == 3
+    with mock.patch("dci.db.declarative.COUNT_ESTIMATE_MIN", 0):
+        jobs = hmac_client_team1.get("/api/v1/jobs?count=estimated").data
+    assert isinstance(jobs["_meta"]["count"], int)
+
+    r = hmac_client_team1.get("/api/v1/jobs?count=approximate")
+    assert r.status_code == 400
+
+
+def test_get_all_jobs_with_embed_and_fields(
+    hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
+):
+    data = {"components": [rhel_80_component_id], "topic_id": rhel_80_topic_id}
+    for _ in range(2):
+        hmac_client_team1.post("/api/v1/jobs", data=data)
+
+    job = hmac_client_team1.get("/api/v1/jobs").data["jobs"][0]
+    for embed in ("components", "topic", "team", "remoteci", "results"):
+        assert embed in job
+
+    job = hmac_client_team1.get("/api/v1/jobs?embed=components,topic.product").data[
+        "jobs"
+    ][0]
+    assert job["components"][0]["id"] == rhel_80_component_id
+    assert job["topic"]["id"] == rhel_80_topic_id
+    for embed in ("team", "remoteci", "results", "keys_values"):
+        assert embed not in job
+
+    jobs = hmac_client_team1.get("/api/v1/jobs?fields=name,status").data
+    assert jobs["_meta"]["count"] == 2
+    assert set(jobs["jobs"][0].keys()) == {"id", "name", "status"}
+
+    jobs = hmac_client_team1.get(
+        "/api/v1/jobs?fields=status&embed=topic&limit=1&after=&sort=created_at"
+    ).data
+    assert set(jobs["jobs"][0].keys()) == {"id", "status", "created_at", "topic"}
+    jobs = hmac_client_team1.get(
+        "/api/v1/jobs?fields=status&limit=1&after=%s&sort=created_at"
+        % jobs["_meta"]["next"]
+    ).data
+    assert len(jobs["jobs"]) == 1
+
+    r = hmac_client_team1.get("/api/v1/jobs?fields=name,unknown")
+    assert r.status_code == 400
+
+
+def test_get_all_jobs_with_cursor_pagination_errors(hmac_client_team1):
+    for args in (
+        "limit=2&after=&sort=name",
+        "limit=2&after=&sort=created_at,id",
+        "limit=2&offset=2&after=",
+        "limit=2&after=notacursor",
+    ):
+        r = hmac_client_team1.get("/api/v1/jobs?%s" % args)
+        assert r.status_code == 400
+
+    r = hmac_client_team1.get("/api/v1/jobs?limit=2&after=&sort=-created_at")
+    cursor = r.data["_meta"]["next"]
+    r = hmac_client_team1.get("/api/v1/jobs?limit=2&sort=created_at&after=%s" % cursor)
+    assert r.status_code == 400
+
+
 @mock.patch("dci.api.v1.notifications.job_dispatcher")
 def test_get_all_jobs_with_subresources(
     job_dispatcher_mock,
@@ -610,6 +733,91 @@ def test_get_job_by_id(hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
     assert "files" in job["job"]
 
 
+def test_get_job_by_id_if_none_match(
+    hmac_client_team1, rhel_80_topic_id, rhel_80_component_id
+):
+    job = hmac_client_team1.post(
+        "/api/v1/jobs",
+        data={"components": [rhel_80_component_id], "topic_id": rhel_80_topic_id},
+    ).data["job"]
+    url = "/api/v1/jobs/%s" % job["id"]
+
+    validator = hmac_client_team1.get(url).headers["ETag"]
+    assert validator.startswith('W/"%s-' % job["etag"])
+    r = hmac_client_team1.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == validator
+    # the etag of the job does not cover the resources it embeds
+    r = hmac_client_team1.get(url, headers={"If-None-Match": job["etag"]})
+    assert r.status_code == 200
+
+    # detaching a component changes the job document, not its etag
+    r = hmac_client_team1.delete(
+        "/api/v1/jobs/%s/components/%s" % (job["id"], rhel_80_component_id)
+    )
+    assert r.status_code == 201
+    r = hmac_client_team1.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert r.data["job"]["components"] == []
+    assert r.data["job"]["etag"] == job["etag"]
+    validator = r.headers["ETag"]
+
+    # the entity tag of the document is an If-Match token of the job
+    r = hmac_client_team1.put(
+        url, data={"comment": "no component"}, headers={"If-match": validator}
+    )
+    assert r.status_code == 200
+
+    validator = hmac_client_team1.get(url).headers["ETag"]
+    data = {"status": "new", "job_id": job["id"]}
+    hmac_client_team1.post("/api/v1/jobstates", data=data)
+    r = hmac_client_team1.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert len(r.data["job"]["jobstates"]) == 1
+
+
+def test_get_job_by_id_postgresql_builder(
+    app,
+    client_admin,
+    hmac_client_team1,
+    team1_job_id,
+    team1_job_file,
+    team1_jobstate_file,
+):
+    headers = {
+        "DCI-JOB-ID": team1_job_id,
+        "DCI-NAME": "name1.xml",
+        "DCI-MIME": "application/junit",
+        "Content-Type": "application/junit",
+    }
+    client_admin.post("/api/v1/files", headers=headers, data=JUNIT)
+    hmac_client_team1.post(
+        "/api/v1/jobs/%s/kv" % team1_job_id, data={"key": "mykey", "value": 1.5}
+    )
+
+    def get_job():
+        r = hmac_client_team1.get("/api/v1/jobs/%s" % team1_job_id)
+        assert r.status_code == 200
+        job = r.data["job"]
+        for key in ("results", "components", "files"):
+            job[key] = sorted(job[key], key=lambda v: v["id"])
+        return r.headers["ETag"], job
+
+    orm_etag, orm_job = get_job()
+    app.config["JOB_DETAIL_BUILDER"] = "postgresql"
+    postgresql_etag, postgresql_job = get_job()
+
+    assert len(orm_job["jobstates"]) == 1
+    assert len(orm_job["files"]) == 2
+    assert len(orm_job["results"]) == 1
+    assert len(orm_job["keys_values"]) == 1
+    assert postgresql_etag == orm_etag
+    assert postgresql_job == orm_job
+
+    r = hmac_client_team1.get("/api/v1/jobs/%s" % uuid.uuid4())
+    assert r.status_code == 404
+
+
 def test_get_jobstates_by_job_id(client_admin, client_user1, team1_job_id):
     data = {"status": "new", "job_id": team1_job_id}
     jobstate_ids = set(
@@ -14,6 +14,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from dci.api.v1 import jobs
+
 
 def test_schedule_jobs(hmac_client_team1, rhel_80_topic, rhel_80_component):
     headers = {
@@ -29,6 +31,51 @@ def test_schedule_jobs(hmac_client_team1, rhel_80_topic, rhel_80_component):
     assert job["client_version"] == headers["Client-Version"]
 
 
+def test_schedule_jobs_too_many_requests(
+    hmac_client_team1, rhel_80_topic, rhel_80_component, monkeypatch
+):
+    monkeypatch.setattr(jobs.schedule_admission, "max_queued", 0)
+    for _ in range(jobs.schedule_admission.max_concurrency):
+        jobs.schedule_admission.acquire("team")
+    try:
+        data = {"topic_id": rhel_80_topic["id"]}
+        r = hmac_client_team1.post("/api/v1/jobs/schedule", data=data)
+        assert r.status_code == 429
+        assert int(r.headers["Retry-After"]) >= 1
+    finally:
+        for _ in range(jobs.schedule_admission.max_concurrency):
+            jobs.schedule_admission.release()
+
+    r = hmac_client_team1.post("/api/v1/jobs/schedule", data=data)
+    assert r.status_code == 201
+
+
+def test_schedule_jobs_uses_the_latest_component(
+    client_admin, hmac_client_team1, rhel_80_topic, rhel_80_component
+):
+    data = {"topic_id": rhel_80_topic["id"]}
+    job = hmac_client_team1.post("/api/v1/jobs/schedule", data=data).data["job"]
+    job = hmac_client_team1.get("/api/v1/jobs/%s" % job["id"]).data["job"]
+    assert job["components"][0]["id"] == rhel_80_component["id"]
+
+    new_component = client_admin.post(
+        "/api/v1/components",
+        data={"topic_id": rhel_80_topic["id"], "name": "RHEL-8.0.1", "type": "compose"},
+    ).data["component"]
+    job = hmac_client_team1.post("/api/v1/jobs/schedule", data=data).data["job"]
+    job = hmac_client_team1.get("/api/v1/jobs/%s" % job["id"]).data["job"]
+    assert job["components"][0]["id"] == new_component["id"]
+
+    r = client_admin.delete(
+        "/api/v1/components/%s" % new_component["id"],
+        headers={"If-match": new_component["etag"]},
+    )
+    assert r.status_code == 204
+    job = hmac_client_team1.post("/api/v1/jobs/schedule", data=data).data["job"]
+    job = hmac_client_team1.get("/api/v1/jobs/%s" % job["id"]).data["job"]
+    assert job["components"][0]["id"] == rhel_80_component["id"]
+
+
 def test_schedule_jobs_with_teams_components(
     client_admin, hmac_client_team1, rhel_80_topic, rhel_80_component, team2_id
 ):
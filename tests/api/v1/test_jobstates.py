@@ -17,6 +17,8 @@
 from __future__ import unicode_literals
 
 import mock
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.orm import Session
 import uuid
 
 
@@ -35,6 +37,29 @@ def test_create_jobstates(client_user1, team1_job_id):
     assert job["job"]["status"] == "running"
 
 
+def test_create_jobstates_integrity_error(client_user1, team1_job_id):
+    data = {"job_id": team1_job_id, "status": "running"}
+    error = sa_exc.IntegrityError("INSERT INTO jobstates", {}, Exception("duplicate"))
+    with mock.patch.object(Session, "commit", side_effect=error):
+        r = client_user1.post("/api/v1/jobstates", data=data)
+    assert r.status_code == 409
+    assert "INSERT" not in r.data["message"]
+    assert "A similar resource already exists" in r.data["message"]
+
+    job = client_user1.get("/api/v1/jobs/%s" % team1_job_id).data
+    assert job["job"]["status"] == "new"
+
+
+def test_create_jobstates_commit_error(client_user1, team1_job_id):
+    data = {"job_id": team1_job_id, "status": "running"}
+    error = sa_exc.OperationalError("UPDATE jobs", {}, Exception("db is down"))
+    with mock.patch.object(Session, "commit", side_effect=error):
+        r = client_user1.post("/api/v1/jobstates", data=data)
+    assert r.status_code == 400
+    assert "UPDATE" not in r.data["message"]
+    assert "contact a DCI administrator" in r.data["message"]
+
+
 @mock.patch("dci.api.v1.jobstates.notifications.job_dispatcher")
 def test_create_jobstates_failure(mocked_disp, client_user1, team1_job_id):
     data = {"job_id": team1_job_id, "status": "failure"}
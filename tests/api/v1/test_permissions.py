@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import uuid
+
+from dci.api.v1 import permissions
+
+
+def _create_component(client_admin, topic_id, team_id=None):
+    data = {"name": "pname", "type": "compose", "topic_id": topic_id}
+    if team_id:
+        data["team_id"] = team_id
+    return client_admin.post("/api/v1/components", data=data).data["component"]["id"]
+
+
+def test_get_unauthorized_components_ids(
+    app, client_admin, rhel_80_topic_id, team1_id, team2_id, team_admin_id
+):
+    public_id = _create_component(client_admin, rhel_80_topic_id)
+    team1_component_id = _create_component(client_admin, rhel_80_topic_id, team1_id)
+    team2_component_id = _create_component(client_admin, rhel_80_topic_id, team2_id)
+    components_ids = [public_id, team1_component_id, team2_component_id]
+
+    with app.app_context():
+        assert permissions.get_unauthorized_components_ids([team1_id], []) == []
+        assert permissions.get_unauthorized_components_ids(
+            [team1_id], components_ids
+        ) == [uuid.UUID(team2_component_id)]
+        assert set(
+            permissions.get_unauthorized_components_ids([team_admin_id], components_ids)
+        ) == set([uuid.UUID(team1_component_id), uuid.UUID(team2_component_id)])
+
+    r = client_admin.post(
+        "/api/v1/teams/%s/permissions/components" % team1_id,
+        data={"teams_ids": [team2_id]},
+    )
+    assert r.status_code == 201
+
+    with app.app_context():
+        assert (
+            permissions.get_unauthorized_components_ids([team1_id], components_ids)
+            == []
+        )
+        assert permissions.get_components_access_teams_ids([team1_id]) == [
+            uuid.UUID(team2_id)
+        ]
@@ -127,6 +127,27 @@ def test_success_get_all_products_user(
     assert ["OPENSHIFT", "OPENSTACK", "RHEL"] == sorted(products)
 
 
+def test_get_product_by_id_if_none_match(client_admin, rhel_product):
+    url = "/api/v1/products/%s" % rhel_product["id"]
+    validator = client_admin.get(url).headers["ETag"]
+    r = client_admin.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 304
+
+    # a new topic changes the product document, not its etag
+    client_admin.post(
+        "/api/v1/topics",
+        data={
+            "name": "RHEL-9.0",
+            "product_id": rhel_product["id"],
+            "component_types": ["compose"],
+        },
+    )
+    r = client_admin.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert "RHEL-9.0" in [t["name"] for t in r.data["product"]["topics"]]
+    assert r.data["product"]["etag"] == rhel_product["etag"]
+
+
 def test_success_delete_product_admin(client_admin, rhel_product):
     result = client_admin.get("/api/v1/products")
     current_products = len(result.data["products"])
@@ -142,6 +142,11 @@ def test_get_all_remotecis_embed(client_admin, team2_id):
 
     for remoteci in remotecis["remotecis"]:
         assert remoteci["team"]["id"] == team["id"]
+        assert "users" not in remoteci
+
+    remotecis = client_admin.get("/api/v1/remotecis?fields=name").data
+    for remoteci in remotecis["remotecis"]:
+        assert set(remoteci.keys()) == {"id", "name"}
 
 
 def test_get_remoteci_by_id(client_user1, team1_id):
@@ -158,6 +163,19 @@ def test_get_remoteci_by_id(client_user1, team1_id):
     assert created_r["remoteci"]["id"] == pr_id
 
 
+def test_get_remoteci_by_id_if_none_match(client_user1, user1_id, team1_remoteci_id):
+    url = "/api/v1/remotecis/%s" % team1_remoteci_id
+    validator = client_user1.get(url).headers["ETag"]
+    r = client_user1.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 304
+
+    # a new subscriber changes the remoteci document
+    client_user1.post("/api/v1/remotecis/%s/users" % team1_remoteci_id)
+    r = client_user1.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert [u["id"] for u in r.data["remoteci"]["users"]] == [user1_id]
+
+
 def test_get_remoteci_with_embed(client_user1, team1_id):
     team = client_user1.get("/api/v1/teams/%s" % team1_id).data["team"]
     premoteci = client_user1.post(
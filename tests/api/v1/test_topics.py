@@ -323,6 +323,36 @@ def test_get_topic_by_id(client_admin, client_user1, rhel_product):
     assert created_ct["topic"]["id"] == pt_id
 
 
+def test_get_topic_by_id_if_none_match(
+    client_admin, client_user1, team1_id, rhel_product, rhel_80_topic, rhel_81_topic
+):
+    client_admin.post(
+        "/api/v1/products/%s/teams" % rhel_product["id"], data={"team_id": team1_id}
+    )
+    r = client_user1.get(
+        "/api/v1/topics/%s" % rhel_81_topic["id"],
+        headers={"If-None-Match": rhel_81_topic["etag"]},
+    )
+    assert r.status_code == 401
+
+    url = "/api/v1/topics/%s" % rhel_80_topic["id"]
+    validator = client_admin.get(url).headers["ETag"]
+    r = client_admin.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == validator
+
+    # renaming the product changes the topic document, not its etag
+    client_admin.put(
+        "/api/v1/products/%s" % rhel_product["id"],
+        data={"name": "Red Hat Enterprise Linux"},
+        headers={"If-match": rhel_product["etag"]},
+    )
+    r = client_admin.get(url, headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert r.data["topic"]["product"]["name"] == "Red Hat Enterprise Linux"
+    assert r.data["topic"]["etag"] == rhel_80_topic["etag"]
+
+
 def test_get_topic_not_found(client_admin):
     result = client_admin.get("/api/v1/topics/%s" % uuid.uuid4())
     assert result.status_code == 404
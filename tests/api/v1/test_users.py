@@ -542,6 +542,18 @@ def test_get_current_user(client_user1):
     assert user_me.data["user"]["name"] == "user1"
 
 
+def test_get_current_user_if_none_match(client_admin, client_user1, user1_id, team2_id):
+    validator = client_user1.get("/api/v1/users/me").headers["ETag"]
+    r = client_user1.get("/api/v1/users/me", headers={"If-None-Match": validator})
+    assert r.status_code == 304
+
+    # a new team changes the user document
+    client_admin.post("/api/v1/teams/%s/users/%s" % (team2_id, user1_id))
+    r = client_user1.get("/api/v1/users/me", headers={"If-None-Match": validator})
+    assert r.status_code == 200
+    assert team2_id in [t["id"] for t in r.data["user"]["team"]]
+
+
 def test_update_current_user_password(client_admin, client_user1):
     user_data, user_etag = get_user(client_admin, "user1")
 
@@ -14,6 +14,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import mock
+
 from dci.db import models2
 from dci import auth
 from tests import utils
@@ -56,3 +58,31 @@ def test_user_without_password_cannot_basic_auth(session, app):
     session.commit()
     user = utils.generate_client(app, ("nopassword@example.org", ""))
     assert user.get("/api/v1/identity").status_code == 401
+
+
+def test_basic_auth_verification_is_cached(client_user1):
+    assert client_user1.get("/api/v1/identity").status_code == 200
+    with mock.patch("dci.auth_mechanism.check_passwords_equal") as m_check:
+        assert client_user1.get("/api/v1/identity").status_code == 200
+        assert not m_check.called
+
+
+def test_basic_auth_cache_invalidated_on_password_change(client_user1, app):
+    assert client_user1.get("/api/v1/identity").status_code == 200
+    user1 = client_user1.get("/api/v1/identity").data["identity"]
+    r = client_user1.put(
+        "/api/v1/identity",
+        data={"current_password": "user1", "new_password": "new_password"},
+        headers={"If-match": user1["etag"]},
+    )
+    assert r.status_code == 200
+    assert client_user1.get("/api/v1/identity").status_code == 401
+    user1_new = utils.generate_client(app, ("user1", "new_password"))
+    assert user1_new.get("/api/v1/identity").status_code == 200
+
+
+def test_basic_auth_wrong_password_is_not_cached(client_user1, app):
+    assert client_user1.get("/api/v1/identity").status_code == 200
+    wrong_password = utils.generate_client(app, ("user1", "wrong"))
+    assert wrong_password.get("/api/v1/identity").status_code == 401
+    assert wrong_password.get("/api/v1/identity").status_code == 401
@@ -14,6 +14,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import mock
+
 
 def test_hmac_mechanism_api_get_jobs_remoteci(hmac_client_team1):
     jobs_request = hmac_client_team1.get("/api/v1/jobs")
@@ -28,3 +30,34 @@ def test_hmac_mechanism_params(hmac_client_team1):
 def test_hmac_mechanism_api_get_jobs_feeder(hmac_client_feeder):
     jobs_request = hmac_client_feeder.get("/api/v1/jobs")
     assert jobs_request.status_code == 200
+
+
+def test_hmac_mechanism_identity_is_cached(hmac_client_team1, team1_remoteci):
+    assert hmac_client_team1.get("/api/v1/identity").status_code == 200
+    with mock.patch("dci.auth_mechanism.base.get_resource_orm") as m_get_resource:
+        assert hmac_client_team1.get("/api/v1/identity").status_code == 200
+        assert not m_get_resource.called
+
+
+def test_hmac_mechanism_cache_invalidated_on_api_secret_change(
+    client_user1, hmac_client_team1, team1_remoteci
+):
+    assert hmac_client_team1.get("/api/v1/identity").status_code == 200
+    r = client_user1.put(
+        "/api/v1/remotecis/%s/api_secret" % team1_remoteci["id"],
+        headers={"If-match": team1_remoteci["etag"]},
+    )
+    assert r.status_code == 200
+    assert hmac_client_team1.get("/api/v1/identity").status_code == 400
+
+
+def test_hmac_mechanism_cache_invalidated_on_delete(
+    client_user1, hmac_client_team1, team1_remoteci
+):
+    assert hmac_client_team1.get("/api/v1/identity").status_code == 200
+    r = client_user1.delete(
+        "/api/v1/remotecis/%s" % team1_remoteci["id"],
+        headers={"If-match": team1_remoteci["etag"]},
+    )
+    assert r.status_code == 204
+    assert hmac_client_team1.get("/api/v1/identity").status_code == 404
@@ -14,7 +14,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
 import datetime
+import os
+import threading
+import time
 
 import dci.auth_mechanism as authm
 from dci.common import exceptions as dci_exc
@@ -59,30 +63,98 @@ def test_sso_auth_verified(
         assert (nb_users + 1) == nb_users_after_sso
 
 
-@mock.patch("jwt.api_jwt.datetime", spec=datetime.datetime)
-@mock.patch("dci.auth_mechanism.sso.get_public_key_from_token")
-def test_sso_auth_verified_public_key_rotation(
-    m_get_public_key_from_token,
-    m_datetime,
-    sso_client_user1,
-    app,
-    session,
-    team_admin_id,
-):
+@contextlib.contextmanager
+def _rotated_sso_key(jwks_cache, public_key="= non valid sso public key here ="):
     sso_public_key = dci_config.CONFIG["SSO_PUBLIC_KEY"]
-    dci_config.CONFIG["SSO_PUBLIC_KEY"] = "= non valid sso public key here ="
+    dci_config.CONFIG["SSO_PUBLIC_KEY"] = public_key
+    try:
+        with mock.patch(
+            "dci.auth_mechanism.sso.get_kid_from_token", return_value="rotated-kid"
+        ), mock.patch.object(authm.sso, "jwks_cache", jwks_cache):
+            yield sso_public_key
+    finally:
+        dci_config.CONFIG["SSO_PUBLIC_KEY"] = sso_public_key
+
+
+def _get_users_me(m_datetime, sso_client, jwks, public_key=None):
+    """GET /users/me with a token signed by the rotated-kid key, with
+    jwks as SSO key set. Return the status codes and the threads that
+    fetched the key set."""
     m_utcnow = mock.MagicMock()
     m_utcnow.utctimetuple.return_value = datetime.datetime.fromtimestamp(
         1518653629
     ).timetuple()
     m_datetime.utcnow.return_value = m_utcnow
-    m_get_public_key_from_token.return_value = sso_public_key
-    with app.app_context():
-        flask.g.team_admin_id = team_admin_id
-        flask.g.session = session
-        teams = sso_client_user1.get("/api/v1/users/me")
-        assert teams.status_code == 200
-    assert dci_config.CONFIG["SSO_PUBLIC_KEY"] == sso_public_key
+    fetching_threads = []
+    jwks_cache = authm.sso.JWKSCache()
+
+    with _rotated_sso_key(jwks_cache, public_key) as sso_public_key:
+
+        def get_jwks():
+            fetching_threads.append(threading.current_thread().name)
+            return {kid: sso_public_key for kid in jwks}
+
+        with mock.patch("dci.auth_mechanism.sso.get_jwks", side_effect=get_jwks):
+            status_codes = [
+                sso_client.get("/api/v1/users/me").status_code for _ in range(2)
+            ]
+    return status_codes, fetching_threads
+
+
+@mock.patch("jwt.api_jwt.datetime", spec=datetime.datetime)
+def test_sso_auth_verified_public_key_rotation(m_datetime, sso_client_user1):
+    # the request waits for the key set fetched in the background
+    status_codes, fetching_threads = _get_users_me(
+        m_datetime, sso_client_user1, ["rotated-kid"], "= non valid public key ="
+    )
+    assert status_codes == [200, 200]
+    assert fetching_threads == ["sso-jwks-refresher"]
+
+
+@mock.patch("jwt.api_jwt.datetime", spec=datetime.datetime)
+def test_sso_auth_verified_without_public_key(m_datetime, sso_client_user1):
+    status_codes, fetching_threads = _get_users_me(
+        m_datetime, sso_client_user1, ["rotated-kid"]
+    )
+    assert status_codes == [200, 200]
+    assert fetching_threads == ["sso-jwks-refresher"]
+
+
+@mock.patch("jwt.api_jwt.datetime", spec=datetime.datetime)
+def test_sso_unknown_key_is_refused(m_datetime, sso_client_user1):
+    status_codes, fetching_threads = _get_users_me(
+        m_datetime, sso_client_user1, ["other-kid"]
+    )
+    assert status_codes == [401, 401]
+    # the second refresh request is rate limited
+    assert fetching_threads == ["sso-jwks-refresher"]
+
+
+def test_app_starts_the_sso_key_set_refresher(app):
+    assert authm.sso.jwks_cache._pid == os.getpid()
+
+
+def test_jwks_cache_waits_for_the_refresh_at_most_timeout():
+    jwks_cache = authm.sso.JWKSCache()
+    start = time.monotonic()
+    # no refresher thread, nobody answers the refresh request
+    assert jwks_cache.wait_for_key("kid1", 0.2) is None
+    assert time.monotonic() - start >= 0.2
+
+
+@mock.patch("dci.auth_mechanism.sso.get_jwks")
+def test_jwks_cache_refresh_is_rate_limited(m_get_jwks):
+    m_get_jwks.return_value = {"kid1": "pem1"}
+    jwks_cache = authm.sso.JWKSCache()
+    assert jwks_cache.get_public_key("kid1") is None
+    assert jwks_cache.refresh()
+    assert jwks_cache.get_public_key("kid1") == "pem1"
+    assert jwks_cache.get_public_key("unknown kid") is None
+    assert jwks_cache.get_public_key(None) is None
+    assert not jwks_cache.refresh()
+    assert m_get_jwks.call_count == 1
+    assert jwks_cache.refresh(force=True)
+    assert m_get_jwks.call_count == 2
 
 
 @mock.patch("jwt.api_jwt.datetime", spec=datetime.datetime)
@@ -355,3 +427,45 @@ def test_sso_auth_get_current_user(
         flask.g.session = session
         request = sso_client_user1.get("/api/v1/users/me?embed=team,remotecis")
         assert request.status_code == 200
+
+
+def _generate_jdoe_client(app, **claims):
+    payload = {
+        "aud": "dci",
+        "sub": "f:436a6686-719b-43ab-a01e-5ecd50b0c8fc:jdoe1@example.org",
+        "typ": "Bearer",
+        "scope": "openid",
+        "name": "John Doe",
+        "email": "jdoe@example.org",
+        "username": "jdoe1@example.org",
+    }
+    payload.update(claims)
+    return generate_client(app, access_token=generate_jwt(payload, SSO_PRIVATE_KEY))
+
+
+def test_sso_identity_is_cached_until_team_membership_changes(
+    app, client_admin, team1_id
+):
+    jdoe_client = _generate_jdoe_client(app)
+    r = jdoe_client.get("/api/v1/identity")
+    assert r.status_code == 200
+    assert r.data["identity"]["teams"] == {}
+    jdoe_id = r.data["identity"]["id"]
+
+    with mock.patch("dci.auth_mechanism.BaseMechanism.get_user") as m_get_user:
+        assert jdoe_client.get("/api/v1/identity").status_code == 200
+        assert not m_get_user.called
+
+    r = client_admin.post("/api/v1/teams/%s/users/%s" % (team1_id, jdoe_id))
+    assert r.status_code == 201
+    r = jdoe_client.get("/api/v1/identity")
+    assert r.status_code == 200
+    assert list(r.data["identity"]["teams"].keys()) == [team1_id]
+
+
+def test_sso_identity_is_not_cached_after_token_expiration(app):
+    jdoe_client = _generate_jdoe_client(app, exp=int(time.time()) + 60)
+    assert jdoe_client.get("/api/v1/identity").status_code == 200
+    key, entry = list(authm.sso_identity_cache._entries.items())[-1]
+    expires_at, _ = entry
+    assert expires_at - time.monotonic() <= 60
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+import pytest
+
+from dci.common import admission
+from dci.common import exceptions as dci_exc
+
+
+def _wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_admit_rejects_when_the_queue_is_full():
+    controller = admission.AdmissionController(
+        max_concurrency=1, max_queued=0, queue_timeout=1
+    )
+    with controller.admit("team1"):
+        with pytest.raises(dci_exc.TooManyRequests) as e:
+            controller.acquire("team2")
+    assert e.value.status_code == 429
+    assert int(e.value.headers["Retry-After"]) >= 1
+
+    # the slot has been released
+    with controller.admit("team2"):
+        pass
+
+
+def test_admit_rejects_when_the_team_queue_is_full():
+    controller = admission.AdmissionController(
+        max_concurrency=1, max_queued=10, max_queued_per_key=1, queue_timeout=5
+    )
+    controller.acquire("team0")
+    waiter = threading.Thread(target=controller.acquire, args=("team1",))
+    waiter.start()
+    _wait_for(lambda: controller._queued == 1)
+
+    with pytest.raises(dci_exc.TooManyRequests):
+        controller.acquire("team1")
+
+    controller.release()
+    waiter.join()
+    controller.release()
+    assert controller._running == 0
+
+
+def test_admit_rejects_after_the_queue_timeout():
+    controller = admission.AdmissionController(max_concurrency=1, queue_timeout=0.05)
+    controller.acquire("team1")
+    with pytest.raises(dci_exc.TooManyRequests):
+        controller.acquire("team1")
+    assert controller._queued == 0
+    assert not controller._queues
+
+
+def test_admit_serves_the_teams_in_turn():
+    controller = admission.AdmissionController(max_concurrency=1, queue_timeout=5)
+    admitted = []
+
+    def schedule(team):
+        controller.acquire(team)
+        admitted.append(team)
+
+    controller.acquire("team0")
+    waiters = []
+    for team in ["team1", "team1", "team1", "team2"]:
+        waiter = threading.Thread(target=schedule, args=(team,))
+        waiter.start()
+        waiters.append(waiter)
+        _wait_for(lambda: controller._queued == len(waiters))
+
+    for i in range(len(waiters)):
+        controller.release()
+        _wait_for(lambda: len(admitted) == i + 1)
+    controller.release()
+    for waiter in waiters:
+        waiter.join()
+
+    assert admitted == ["team1", "team2", "team1", "team1"]
+    assert controller._running == 0
+
+
+def test_admit_is_disabled_without_concurrency():
+    controller = admission.AdmissionController(max_concurrency=0, max_queued=0)
+    with controller.admit("team1"):
+        with controller.admit("team1"):
+            pass
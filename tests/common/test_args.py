@@ -75,6 +75,7 @@ def test_parse_args():
         "sort": "field_1,field_2",
         "where": "field_1:value_1,field_2:value_2",
         "embed": "resource_1,resource_2",
+        "fields": "field_1,field_2",
         "created_after": "2021-12-18T01:04:05.080452",
         "updated_after": "1640090291000",
     }
@@ -84,6 +85,7 @@ def test_parse_args():
         "sort": ["field_1", "field_2"],
         "where": ["field_1:value_1", "field_2:value_2"],
         "embed": ["resource_1", "resource_2"],
+        "fields": ["field_1", "field_2"],
         "created_after": datetime(2021, 12, 18, 1, 4, 5, 80452),
         "updated_after": datetime(2021, 12, 21, 12, 38, 11),
     }
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import json
+import uuid
+
+import flask
+import mock
+import pytest
+import pytz
+
+from dci.common import utils
+
+requires_orjson = pytest.mark.skipif(utils.orjson is None, reason="needs orjson")
+
+
+def _document():
+    return {
+        "id": uuid.uuid4(),
+        "created_at": datetime.datetime(2021, 3, 4, 5, 6, 7, 8),
+        "released_at": datetime.datetime(2021, 3, 4, tzinfo=pytz.utc),
+        "name": "RHEL-8.4 é",
+        "tags": ["build:ga"],
+        "data": {"b": 1.5, "a": None, "big": 2**70},
+        "unknown": object(),
+    }
+
+
+@requires_orjson
+def test_orjson_encoder_produces_the_same_document():
+    document = _document()
+    expected = json.dumps(document, cls=utils.JSONEncoder, sort_keys=True)
+    result = json.dumps(document, cls=utils.ORJSONEncoder, sort_keys=True)
+    assert json.loads(result) == json.loads(expected)
+    assert json.loads(result)["unknown"] is None
+
+
+@requires_orjson
+def test_orjson_encoder_sorts_keys_and_indents():
+    document = {"b": 1, "a": {"d": 2, "c": 3}}
+    assert json.dumps(document, cls=utils.ORJSONEncoder, sort_keys=True) == (
+        '{"a":{"c":3,"d":2},"b":1}'
+    )
+    assert json.dumps(
+        document, cls=utils.ORJSONEncoder, sort_keys=True, indent=2
+    ) == json.dumps(document, sort_keys=True, indent=2)
+    assert json.dumps(
+        document, cls=utils.ORJSONEncoder, sort_keys=True, indent=4
+    ) == json.dumps(document, sort_keys=True, indent=4)
+
+
+def test_get_json_encoder():
+    assert utils.get_json_encoder("json") is utils.JSONEncoder
+    with mock.patch("dci.common.utils.orjson", None):
+        assert utils.get_json_encoder("orjson") is utils.JSONEncoder
+    with pytest.raises(ValueError):
+        utils.get_json_encoder("ujson")
+
+
+@requires_orjson
+def test_orjson_encoder_changes_the_wire_format():
+    document = {"name": "RHEL-8.4 é", "value": float("nan")}
+    assert json.dumps(document, cls=utils.ORJSONEncoder) == (
+        '{"name":"RHEL-8.4 é","value":null}'
+    )
+
+
+def test_app_keeps_the_json_wire_format_by_default(app):
+    assert app.json_encoder is utils.JSONEncoder
+    document = {"name": "RHEL-8.4 é", "value": float("nan")}
+    with app.app_context():
+        assert flask.json.dumps(document) == (
+            '{"name": "RHEL-8.4 \\u00e9", "value": NaN}'
+        )
@@ -15,8 +15,11 @@
 # under the License.
 
 import dci.app
+from dci import auth_mechanism
+from dci.api.v1 import components
 from dci import dci_config
 from dci.db import models2
+from dci.stores import filesystem
 import tests.utils as utils
 import tests.sso_tokens as sso_tokens
 
@@ -106,9 +109,25 @@ def app(db_provisioning, engine, fs_clean):
     app.testing = True
     app.engine = engine
     app.messaging.publish = lambda x: None
+    # the database is reset between the tests, the process caches must be too
+    auth_mechanism.hmac_identity_cache.clear()
+    auth_mechanism.basic_auth_cache.clear()
+    auth_mechanism.sso_identity_cache.clear()
+    components.latest_components_cache.clear()
     return app
 
 
+@pytest.fixture
+def filesystem_store(app, tmpdir):
+    app.store = filesystem.FileSystem(
+        {
+            "path": str(tmpdir),
+            "containers": {"files": "dci-files", "components": "dci-components"},
+        }
+    )
+    return app.store
+
+
 # Clients
 # Clients basic auth
 @pytest.fixture
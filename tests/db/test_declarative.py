@@ -15,7 +15,12 @@
 # under the License.
 
 from dci.db import declarative as d
+from dci.db import models2
+from sqlalchemy.orm.attributes import set_committed_value
+
+import datetime
 import mock
+import uuid
 
 
 def test_handle_pagination():
@@ -30,3 +35,63 @@ def test_handle_pagination():
     d.handle_pagination(m, {"limit": 300, "offset": 12})
     m.offset.assert_called_once_with(12)
     m.limit.assert_called_once_with(200)
+
+
+def test_serialize():
+    now = datetime.datetime(2021, 3, 4, 5, 6, 7)
+    topic = models2.Topic(
+        id=uuid.uuid4(), name="RHEL-8", created_at=now, component_types=["a"]
+    )
+    component = models2.Component(
+        id=uuid.uuid4(),
+        name="c1",
+        type="compose",
+        topic_id=topic.id,
+        data={"foo": "bar"},
+        created_at=now,
+    )
+    job = models2.Job(id=uuid.uuid4(), created_at=now, data={"config": "x"})
+    set_committed_value(job, "topic", topic)
+    set_committed_value(job, "components", [component])
+
+    serialized = job.serialize(ignore_columns=["data", "components.data"])
+
+    assert serialized["id"] == str(job.id)
+    assert serialized["created_at"] == "2021-03-04T05:06:07"
+    assert "data" not in serialized
+    assert serialized["topic"]["id"] == str(topic.id)
+    assert serialized["topic"]["component_types"] == ["a"]
+    assert serialized["components"][0]["topic_id"] == str(topic.id)
+    assert "data" not in serialized["components"][0]
+    assert component.serialize()["data"] == {"foo": "bar"}
+
+
+def test_serialize_user_does_not_expose_password():
+    user = models2.User(id=uuid.uuid4(), name="jdoe", password="secret")
+    serialized = user.serialize()
+    assert serialized["name"] == "jdoe"
+    assert "password" not in serialized
+
+
+def test_cursor_sort_keys_are_indexed_and_not_nullable():
+    job_keys = d._get_cursor_sort_keys(models2.Job)
+    assert "created_at" in job_keys and "id" in job_keys
+    assert "name" not in job_keys
+    assert d._get_cursor_sort_keys(models2.JobEvent) == ["created_at", "id", "job_id"]
+    assert "released_at" in d._get_cursor_sort_keys(models2.Component)
+    # unique but nullable
+    assert "email" not in d._get_cursor_sort_keys(models2.User)
+
+
+def test_cursor_builder():
+    assert d.get_cursor_builder(models2.Job, {"limit": 2}) is None
+
+    build_cursor = d.get_cursor_builder(models2.Job, {"limit": 2, "after": ""})
+    job = models2.Job(id=uuid.uuid4(), created_at=datetime.datetime(2021, 3, 4))
+    assert build_cursor(job, 1) is None
+    assert build_cursor(None, 0) is None
+    cursor = build_cursor(job, 2)
+    assert d._decode_cursor(cursor, "-created_at", 2) == [
+        "2021-03-04T00:00:00",
+        str(job.id),
+    ]
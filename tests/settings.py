@@ -63,3 +63,5 @@ dn/RsYEONbwQSjIfMPkvxF+8HQ==
 """
 
 SSO_REALM = "redhat-external"
+
+SSO_JWKS_REFRESH_INTERVAL = 0
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import io
+import os
+
+import mock
+import pytest
+
+from dci.stores import filesystem
+from dci.stores import files_utils
+
+
+@pytest.fixture
+def store(tmpdir):
+    return filesystem.FileSystem(
+        {"path": str(tmpdir), "containers": {"files": "dci-files"}}
+    )
+
+
+def test_upload_writes_the_checksum(store, tmpdir):
+    store.upload("files", "team/file", io.BytesIO(b"content"))
+    checksum_path = os.path.join(str(tmpdir), "dci-files", "team", "file.md5")
+    with open(checksum_path) as f:
+        assert f.read() == hashlib.md5(b"content").hexdigest()
+
+
+def test_upload_reuses_the_checksum_reader(store):
+    reader = files_utils.ChecksumReader(io.BytesIO(b"content"))
+    store.upload("files", "team/file", reader)
+    assert store.head("files", "team/file")["etag"] == reader.md5
+
+
+def test_head_does_not_read_the_file(store):
+    store.upload("files", "team/file", b"content")
+    with mock.patch.object(files_utils, "md5Checksum") as md5_checksum:
+        head = store.head("files", "team/file")
+    assert not md5_checksum.called
+    assert head["content-length"] == 7
+    assert head["etag"] == hashlib.md5(b"content").hexdigest()
+
+
+def test_head_writes_the_checksum_of_the_legacy_files(store, tmpdir):
+    os.makedirs(os.path.join(str(tmpdir), "dci-files", "team"))
+    with open(os.path.join(str(tmpdir), "dci-files", "team", "file"), "wb") as f:
+        f.write(b"content")
+
+    assert store.head("files", "team/file")["etag"] == (
+        hashlib.md5(b"content").hexdigest()
+    )
+    with mock.patch.object(files_utils, "md5Checksum") as md5_checksum:
+        store.head("files", "team/file")
+    assert not md5_checksum.called
+
+
+def test_head_computes_the_checksum_of_the_modified_files(store, tmpdir):
+    store.upload("files", "team/file", b"content")
+    file_path = os.path.join(str(tmpdir), "dci-files", "team", "file")
+    with open(file_path, "wb") as f:
+        f.write(b"modified")
+    checksum_stat = os.stat(file_path + ".md5")
+    os.utime(
+        file_path,
+        ns=(checksum_stat.st_atime_ns, checksum_stat.st_mtime_ns + 1000000),
+    )
+
+    assert store.head("files", "team/file")["etag"] == (
+        hashlib.md5(b"modified").hexdigest()
+    )
+
+
+def test_delete_removes_the_checksum(store, tmpdir):
+    store.upload("files", "team/file", b"content")
+    store.delete("files", "team/file")
+    assert os.listdir(os.path.join(str(tmpdir), "dci-files", "team")) == []
@@ -1,7 +1,97 @@
+import io
+import os
+import uuid
+
+import mock
+import pytest
+
 from dci import dci_config
+from dci.common import exceptions
 
 
 def test_nrt_s3_config_is_merged_correctly():
     store = dci_config.get_store()
     assert store.s3_config.region_name == "us-east-1"
     assert store.s3_config.signature_version == "s3v4"
+
+
+class FailingReader(object):
+    def __init__(self, data, fail_at):
+        self._stream = io.BytesIO(data)
+        self.fail_at = fail_at
+
+    def read(self, size=-1):
+        if self._stream.tell() >= self.fail_at:
+            raise Exception("connection reset")
+        return self._stream.read(size)
+
+
+@pytest.fixture
+def store():
+    store = dci_config.get_store()
+    store.part_size = 5 * 1024 * 1024
+    store.max_concurrency = 2
+    return store
+
+
+def _get_content(store, filename):
+    _, body = store.get("files", filename)
+    return body.read()
+
+
+def test_upload_small_file_in_one_request(store):
+    filename = "small-%s" % uuid.uuid4()
+    with mock.patch.object(
+        store.s3, "create_multipart_upload", wraps=store.s3.create_multipart_upload
+    ) as create_multipart_upload:
+        store.upload("files", filename, io.BytesIO(b"small"))
+    assert not create_multipart_upload.called
+    assert _get_content(store, filename) == b"small"
+
+
+def test_upload_large_file_in_parts(store):
+    filename = "large-%s" % uuid.uuid4()
+    data = os.urandom(store.part_size * 2 + 1024)
+    store.upload("files", filename, io.BufferedReader(io.BytesIO(data), 4096))
+    assert store.head("files", filename)["ETag"].endswith('-3"')
+    assert _get_content(store, filename) == data
+
+
+def test_upload_aborts_the_multipart_upload_on_failure(store):
+    filename = "failed-%s" % uuid.uuid4()
+    data = FailingReader(os.urandom(store.part_size * 3), store.part_size * 2)
+    with pytest.raises(Exception):
+        store.upload("files", filename, data)
+
+    uploads = store.s3.list_multipart_uploads(Bucket="dci-files", Prefix=filename)
+    assert uploads.get("Uploads", []) == []
+    with pytest.raises(exceptions.StoreException):
+        store.head("files", filename)
+
+
+def test_upload_verifies_the_bucket_once(store):
+    store.containers = {"files": "dci-test-%s" % uuid.uuid4()}
+    with mock.patch.object(
+        store.s3, "head_bucket", wraps=store.s3.head_bucket
+    ) as head_bucket:
+        store.upload("files", "file1", b"content1")
+        store.upload("files", "file2", b"content2")
+    assert head_bucket.call_count == 1
+    assert _get_content(store, "file2") == b"content2"
+
+
+def test_upload_creates_the_deleted_bucket_again(store):
+    bucket = "dci-test-%s" % uuid.uuid4()
+    store.containers = {"files": bucket}
+    store.upload("files", "file1", b"content1")
+    store.delete("files", "file1")
+    store.s3.delete_bucket(Bucket=bucket)
+
+    store.upload("files", "file2", b"content2")
+    assert _get_content(store, "file2") == b"content2"
+
+    store.delete("files", "file2")
+    store.s3.delete_bucket(Bucket=bucket)
+    data = os.urandom(store.part_size + 1024)
+    store.upload("files", "file3", io.BytesIO(data))
+    assert _get_content(store, "file3") == data
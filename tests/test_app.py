@@ -17,6 +17,7 @@
 import alembic.autogenerate
 import alembic.environment
 import alembic.script
+import flask
 import sqlalchemy_utils.functions
 
 import dci.alembic.utils
@@ -87,3 +88,14 @@ def test_db_migration():
         )
 
     assert diff == []
+
+
+def test_db_connection_is_lazy(app):
+    with app.test_request_context("/api/v1/"):
+        app.preprocess_request()
+        assert "db_conn" not in flask.g
+        assert "session" not in flask.g
+
+        session = flask.g.session
+        assert "db_conn" in flask.g
+        assert session.bind is flask.g.db_conn
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import flask
+import mock
+import pytest
+
+from dci import outbox
+from dci.db import models2
+
+
+def _finish_job(app, client_user1, job_id):
+    app.config["JOBSTATE_SIDE_EFFECTS"] = "outbox"
+    data = {"job_id": job_id, "status": "failure"}
+    r = client_user1.post("/api/v1/jobstates", data=data)
+    assert r.status_code == 201
+
+
+def _dispatch(app, session, messaging, **kwargs):
+    with app.app_context():
+        flask.g.session = session
+        flask.g.sender = mock.Mock()
+        flask.g.messaging = messaging
+        return outbox.dispatch(session, **kwargs)
+
+
+@mock.patch("dci.api.v1.notifications.job_dispatcher")
+def test_final_jobstate_writes_an_outbox_event(
+    mocked_disp, app, session, client_admin, client_user1, team1_job_id
+):
+    _finish_job(app, client_user1, team1_job_id)
+    assert not mocked_disp.called
+
+    events = session.query(models2.OutboxEvent).all()
+    assert len(events) == 1
+    assert events[0].event == "job_finished"
+    assert events[0].data == {"job_id": team1_job_id}
+
+    jobs_events = client_admin.get("/api/v1/jobs_events/0").data["jobs_events"]
+    assert len(jobs_events) == 1
+    assert jobs_events[0]["job_id"] == team1_job_id
+    assert jobs_events[0]["status"] == "error"
+
+    job = client_user1.get("/api/v1/jobs/%s" % team1_job_id).data["job"]
+    assert job["status"] == "failure"
+    assert len(job["jobstates"]) == 1
+
+    # the job is already finished, no other event
+    _finish_job(app, client_user1, team1_job_id)
+    assert session.query(models2.OutboxEvent).count() == 1
+
+
+@mock.patch("dci.api.v1.notifications.job_dispatcher")
+def test_dispatch_runs_and_deletes_the_events(
+    mocked_disp, app, session, client_user1, team1_job_id
+):
+    _finish_job(app, client_user1, team1_job_id)
+    messaging = mock.Mock()
+
+    assert _dispatch(app, session, messaging) == 1
+
+    (job,), _ = mocked_disp.call_args
+    assert str(job["id"]) == team1_job_id
+    assert "components" in job and "remoteci" in job and "results" in job
+    (payload,), _ = messaging.publish.call_args
+    assert payload["event"] == "job_finished"
+    assert str(payload["job"]["id"]) == team1_job_id
+    assert messaging.flush.called
+    assert session.query(models2.OutboxEvent).count() == 0
+    assert _dispatch(app, session, messaging) == 0
+
+
+@mock.patch("dci.api.v1.notifications.job_dispatcher")
+def test_dispatch_keeps_the_failed_events(
+    mocked_disp, app, session, client_user1, team1_job_id
+):
+    _finish_job(app, client_user1, team1_job_id)
+    mocked_disp.side_effect = Exception("zmq is down")
+    messaging = mock.Mock()
+
+    assert _dispatch(app, session, messaging, max_attempts=2) == 1
+    assert _dispatch(app, session, messaging, max_attempts=2) == 1
+    assert _dispatch(app, session, messaging, max_attempts=2) == 0
+    assert not messaging.publish.called
+    event = session.query(models2.OutboxEvent).one()
+    assert event.attempts == 2
+
+    mocked_disp.side_effect = None
+    assert _dispatch(app, session, messaging) == 1
+    assert session.query(models2.OutboxEvent).count() == 0
+
+
+def test_run_opens_a_session_per_loop(app):
+    sessions = []
+
+    def dispatch(session, batch_size, max_attempts):
+        assert flask.g.session is session
+        sessions.append(session)
+        if len(sessions) == 2:
+            raise Exception("database is down")
+        return 0
+
+    with mock.patch("dci.outbox.dispatch", side_effect=dispatch), mock.patch(
+        "dci.outbox.time.sleep", side_effect=[None, None, KeyboardInterrupt]
+    ):
+        with pytest.raises(KeyboardInterrupt):
+            outbox.run(app)
+
+    assert len(sessions) == 3
+    assert len(set(sessions)) == 3
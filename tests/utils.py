@@ -101,7 +101,7 @@ def generate_token_based_client(app, resource):
             payload = kwargs.get("data")
             data = flask.json.dumps(payload, cls=utils.JSONEncoder) if payload else ""
             url = urlparse(args[0])
-            params = dict(parse_qsl(url.query))
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
             headers = kwargs.get("headers", {})
             headers.update(
                 generate_headers(